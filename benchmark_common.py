@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+
+def format_size(size):
+    """Розмір у зручному для читання вигляді"""
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.4g} {unit}"
+        size /= 1024
+
+
+def add_baseline_arguments(parser, default_baseline):
+    """Спільні аргументи базової лінії: файл, збереження та допустиме падіння"""
+    parser.add_argument("--baseline", default=default_baseline, help="файл базової лінії (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="зберегти результати як базову лінію")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="допустиме падіння відносно базової лінії (0.2 = 20%%)")
+
+
+def compare_with_baseline(flat, baseline_file, tolerance):
+    """
+    Порівняння з базовою лінією
+
+    Returns:
+        list: регресії (назва, базове_значення, поточне_значення)
+    """
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, value in flat.items():
+        base_value = baseline.get(name)
+        if base_value and value < base_value * (1 - tolerance):
+            regressions.append((name, base_value, value))
+    return regressions
+
+
+def save_or_compare(flat, args, skip_reason=None):
+    """
+    Збереження результатів як базової лінії (--save-baseline) або порівняння з нею.
+    За наявності регресій процес завершується з кодом 1.
+
+    Args:
+        flat: плоский словник метрик {"назва": значення} (більше - краще)
+        args: аргументи з add_baseline_arguments
+        skip_reason: причина не порівнювати (напр. профілювання спотворює час)
+    """
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(flat, f, indent=4)
+        print(f"\nБазову лінію збережено у файл: {args.baseline}")
+    elif skip_reason:
+        print(f"\nПорівняння з базовою лінією пропущено: {skip_reason}")
+    elif os.path.exists(args.baseline):
+        regressions = compare_with_baseline(flat, args.baseline, args.tolerance)
+        if regressions:
+            print("\nРЕГРЕСІЇ ВІДНОСНО БАЗОВОЇ ЛІНІЇ:")
+            for name, base_value, value in regressions:
+                print(f"  - {name}: {base_value:.1f} -> {value:.1f} ({value / base_value - 1:+.0%})")
+            sys.exit(1)
+        print("\nРегресій відносно базової лінії не виявлено")
@@ -1,6 +1,13 @@
+import os
 import re
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import instrument
+
+
 class PasswordSecurityAnalyzer:
     """Клас для аналізу безпеки пароля на основі різних критеріїв."""
     def __init__(self):
@@ -15,6 +22,7 @@ class PasswordSecurityAnalyzer:
             "love", "money", "baby", "angel", "princess", "sunshine"
         ]
 
+    @instrument("lab01.analyze_password")
     def analyze_password(self, password, personal_data):
         """
         Основна функція аналізу пароля.
@@ -1,5 +1,13 @@
-def caesar_encrypt(text, shift):
-    """Шифрування методом Цезаря"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import instrument
+
+
+def _caesar_shift(text, shift):
+    """Зсув літер українського та англійського алфавітів на shift позицій"""
     ua_alphabet = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюя'
     en_alphabet = 'abcdefghijklmnopqrstuvwxyz'
     result = []
@@ -23,11 +31,19 @@ def caesar_encrypt(text, shift):
     return ''.join(result)
 
 
+@instrument("lab02.caesar_encrypt", size_arg=0, unit="chars")
+def caesar_encrypt(text, shift):
+    """Шифрування методом Цезаря"""
+    return _caesar_shift(text, shift)
+
+
+@instrument("lab02.caesar_decrypt", size_arg=0, unit="chars")
 def caesar_decrypt(text, shift):
     """Розшифрування методом Цезаря"""
-    return caesar_encrypt(text, -shift)
+    return _caesar_shift(text, -shift)
 
 
+@instrument("lab02.vigenere_encrypt", size_arg=0, unit="chars")
 def vigenere_encrypt(text, key):
     """Шифрування методом Віженера"""
     ua_alphabet = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюя'
@@ -67,6 +83,7 @@ def vigenere_encrypt(text, key):
     return ''.join(result)
 
 
+@instrument("lab02.vigenere_decrypt", size_arg=0, unit="chars")
 def vigenere_decrypt(text, key):
     """Розшифрування методом Віженера"""
     ua_alphabet = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюя'
@@ -0,0 +1,183 @@
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+# Каталог лабораторної (модуль lab4) і корінь репозиторію (спільні модулі benchmark_common, metrics)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab4 import DigitalSignatureSystem, HASH_BACKENDS
+from benchmark_common import add_baseline_arguments, format_size, save_or_compare
+
+
+DEFAULT_SIZES = [1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def measure(func, repeat):
+    """Найкращий час виконання з repeat спроб (секунди)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_hash_backends(sizes, repeat):
+    """
+    Порівняння швидкості хеш-алгоритмів на документах різного розміру
+
+    Returns:
+        dict: {алгоритм: {розмір: МБ/с}}
+    """
+    dss = DigitalSignatureSystem()
+    results = {algorithm: {} for algorithm in HASH_BACKENDS}
+
+    for size in sizes:
+        document = os.urandom(size)
+        for algorithm in HASH_BACKENDS:
+            seconds = measure(lambda: dss.calculate_document_hash(document, algorithm), repeat)
+            results[algorithm][size] = size / seconds / (1024 * 1024)
+
+    return results
+
+
+def print_hash_report(results, sizes):
+    """Виведення таблиці МБ/с для кожного алгоритму"""
+    print("\n" + "=" * 70)
+    print("ШВИДКІСТЬ ХЕШ-АЛГОРИТМІВ (МБ/с)")
+    print("=" * 70)
+    print(f"{'Алгоритм':<12}" + "".join(f"{format_size(size):>12}" for size in sizes))
+    print("-" * 70)
+    for algorithm, by_size in results.items():
+        print(f"{algorithm:<12}" + "".join(f"{by_size[size]:>12.1f}" for size in sizes))
+    print("=" * 70)
+
+
+def benchmark_sign_verify(sizes, count, repeat, algorithm="sha256"):
+    """
+    Пропускна здатність create_signature / verify_signature
+
+    Args:
+        sizes: розміри документів у байтах
+        count: кількість документів кожного розміру
+        repeat: кількість повторів (береться найкращий результат)
+        algorithm: хеш-алгоритм підпису
+
+    Returns:
+        dict: {"sign"/"verify": {розмір: {"mb_s": ..., "ops_s": ...}}}
+    """
+    dss = DigitalSignatureSystem()
+    private_key = dss.generate_keys("benchmark", "01012000", "secret")[0]
+    results = {"sign": {}, "verify": {}}
+
+    for size in sizes:
+        # Один буфер на розмір: документи - зрізи зі зсувом (memoryview, без копій),
+        # тож пам'ять не зростає у count разів і не спотворює вимірювання
+        buffer = memoryview(os.urandom(size + count))
+        documents = [buffer[i:i + size] for i in range(count)]
+        signatures = [dss.create_signature(document, private_key, algorithm) for document in documents]
+
+        def sign_all():
+            for document in documents:
+                dss.create_signature(document, private_key, algorithm)
+
+        def verify_all():
+            for document, signature in zip(documents, signatures):
+                if not dss.verify_signature(document, signature, private_key):
+                    raise RuntimeError("Бенчмарк: підпис не пройшов перевірку")
+
+        for op, func in (("sign", sign_all), ("verify", verify_all)):
+            seconds = measure(func, repeat)
+            results[op][size] = {
+                "mb_s": size * count / seconds / (1024 * 1024),
+                "ops_s": count / seconds
+            }
+
+    return results
+
+
+def print_sign_verify_report(results, sizes, count):
+    """Виведення таблиці пропускної здатності підпису та перевірки"""
+    print("\n" + "=" * 70)
+    print(f"ПІДПИС І ПЕРЕВІРКА ({count} документів кожного розміру)")
+    print("=" * 70)
+    print(f"{'Розмір':<12}{'Підпис МБ/с':>14}{'Підпис оп/с':>14}{'Перевірка МБ/с':>16}{'Перевірка оп/с':>16}")
+    print("-" * 70)
+    for size in sizes:
+        sign, verify = results["sign"][size], results["verify"][size]
+        print(f"{format_size(size):<12}{sign['mb_s']:>14.1f}{sign['ops_s']:>14.0f}"
+              f"{verify['mb_s']:>16.1f}{verify['ops_s']:>16.0f}")
+    print("=" * 70)
+
+
+def flatten_results(hash_results, sign_results):
+    """Плоский словник метрик {"назва": значення} (більше - краще) для базової лінії"""
+    flat = {}
+    for algorithm, by_size in (hash_results or {}).items():
+        for size, mb_s in by_size.items():
+            flat[f"hash/{algorithm}/{size}/mb_s"] = mb_s
+    for op, by_size in (sign_results or {}).items():
+        for size, values in by_size.items():
+            for metric, value in values.items():
+                flat[f"{op}/{size}/{metric}"] = value
+    return flat
+
+
+def run_suites(args):
+    """Запуск вибраних наборів вимірювань"""
+    hash_results = sign_results = None
+    if "hash" in args.suite:
+        hash_results = benchmark_hash_backends(args.sizes, args.repeat)
+        print_hash_report(hash_results, args.sizes)
+    if "sign" in args.suite:
+        sign_results = benchmark_sign_verify(args.sizes, args.count, args.repeat, args.algorithm)
+        print_sign_verify_report(sign_results, args.sizes, args.count)
+    return hash_results, sign_results
+
+
+def main():
+    """Головна функція бенчмарку"""
+    parser = argparse.ArgumentParser(description="Бенчмарк системи цифрових підписів (lab4)")
+    parser.add_argument("--suite", nargs="+", choices=["hash", "sign"], default=["hash", "sign"],
+                        help="набори вимірювань")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="розміри документів у байтах")
+    parser.add_argument("--count", type=int, default=10, help="кількість документів кожного розміру")
+    parser.add_argument("--repeat", type=int, default=3, help="кількість повторів вимірювання")
+    parser.add_argument("--algorithm", default="sha256", help="хеш-алгоритм для підпису")
+    parser.add_argument("--profile", action="store_true", help="профілювання через cProfile")
+    parser.add_argument("--memory", action="store_true", help="пікова пам'ять через tracemalloc")
+    add_baseline_arguments(parser, DEFAULT_BASELINE)
+    args = parser.parse_args()
+
+    if args.memory:
+        tracemalloc.start()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    hash_results, sign_results = run_suites(args)
+
+    if profiler:
+        profiler.disable()
+        print("\nПРОФІЛЬ (топ-20 за сукупним часом):")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    if args.memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\nПікове використання пам'яті: {format_size(peak)}")
+
+    flat = flatten_results(hash_results, sign_results)
+    save_or_compare(flat, args, "профілювання спотворює час" if args.profile or args.memory else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,789 @@
+import contextlib
 import hashlib
 import os
 import json
+import mmap
+import secrets
+import sqlite3
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import instrument
+
+
+# Реєстр хеш-алгоритмів: назва -> (числовий ідентифікатор, конструктор)
+HASH_BACKENDS = {
+    "sha256": (1, hashlib.sha256),
+    "sha512": (2, hashlib.sha512),
+    "blake2b": (3, hashlib.blake2b),
+    "blake2s": (4, hashlib.blake2s),
+    "sha3_256": (5, hashlib.sha3_256),
+    "sha3_512": (6, hashlib.sha3_512),
+}
+
+# Версія заголовка підпису: "v1:<алгоритм>:<підпис hex>"
+SIGNATURE_VERSION = "v1"
+
+
+def get_hash_backend(algorithm):
+    """Конструктор хеш-функції за назвою алгоритму"""
+    if algorithm not in HASH_BACKENDS:
+        raise ValueError(f"Невідомий алгоритм хешування: {algorithm}")
+    return HASH_BACKENDS[algorithm][1]
+
+
+class HashCache:
+    """
+    Постійний кеш хешів файлів (SQLite у робочому каталозі).
+    Ключ - ідентичність файлу: (пристрій, inode, розмір, mtime_ns) та алгоритм хешування.
+    """
+
+    # Найбільша кількість записів в одній транзакції пакетного режиму
+    BATCH_COMMIT_SIZE = 1000
+
+    def __init__(self, db_file="hash_cache.db"):
+        self.db_file = db_file
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._batch_depth = 0
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            "dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT, "
+            "path TEXT, hash TEXT, PRIMARY KEY (dev, ino, size, mtime_ns, algorithm))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _identity(stat_result):
+        """Ключ кешу з результату os.stat"""
+        return (stat_result.st_dev, stat_result.st_ino,
+                stat_result.st_size, stat_result.st_mtime_ns)
+
+    def get(self, stat_result, algorithm="sha256"):
+        """Пошук хешу за метаданими файлу (None - немає у кеші)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM file_hashes "
+                "WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm=?",
+                self._identity(stat_result) + (algorithm,)
+            ).fetchone()
+            if row:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, stat_result, path, file_hash, algorithm="sha256"):
+        """Збереження хешу; застарілі записи для того ж файлу видаляються"""
+        dev, ino, size, mtime_ns = self._identity(stat_result)
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM file_hashes WHERE dev=? AND ino=? AND (size!=? OR mtime_ns!=?)",
+                (dev, ino, size, mtime_ns)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (dev, ino, size, mtime_ns, algorithm, os.path.abspath(path), file_hash)
+            )
+            self._uncommitted += 1
+            if not self._batch_depth or self._uncommitted >= self.BATCH_COMMIT_SIZE:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Пакетний режим: записи put() фіксуються однією транзакцією при виході
+        (або кожні BATCH_COMMIT_SIZE записів) замість commit на кожен файл
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._uncommitted:
+                    self._conn.commit()
+                    self._uncommitted = 0
+
+    def evict_stale(self):
+        """
+        Видалення записів для файлів, які зникли або змінилися
+
+        Returns:
+            int: кількість видалених записів
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dev, ino, size, mtime_ns, path FROM file_hashes"
+            ).fetchall()
+            stale = []
+            for row in rows:
+                try:
+                    current = self._identity(os.stat(row[4]))
+                except OSError:
+                    current = None
+                if current != tuple(row[:4]):
+                    stale.append(row[:4])
+
+            self._conn.executemany(
+                "DELETE FROM file_hashes WHERE dev=? AND ino=? AND size=? AND mtime_ns=?", stale
+            )
+            self._conn.commit()
+            return len(stale)
+
+    def stats(self):
+        """Статистика звернень до кешу"""
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries
+        }
+
+    def close(self):
+        """Закриття з'єднання з базою"""
+        self._conn.close()
+
+
+class KeyStore:
+    """
+    Сховище багатьох ідентичностей (SQLite з індексом за ім'ям).
+    Декодовані ключі кешуються в пам'яті; кеш скидається, коли файл бази змінюється.
+    """
+
+    def __init__(self, db_file="keystore.db"):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS identities ("
+            "name TEXT PRIMARY KEY, private_key TEXT, public_key TEXT, private_key_hash TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._cache = {}
+        self._default = None
+        self._stamp = None
+
+    def _file_stamp(self):
+        """Відбиток файлу бази (mtime_ns, розмір) для інвалідації кешу"""
+        stat_result = os.stat(self.db_file)
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    def _refresh(self):
+        """Скидання кешу, якщо базу змінив інший процес (власні записи оновлюють кеш самі)"""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._cache.clear()
+            row = self._conn.execute("SELECT value FROM meta WHERE key='default'").fetchone()
+            self._default = row[0] if row else None
+            self._stamp = stamp
+
+    def put(self, name, private_key, public_key, private_key_hash, make_default=True):
+        """Додавання або оновлення ідентичності"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?)",
+                (name, str(private_key), str(public_key), private_key_hash)
+            )
+            if make_default:
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('default', ?)", (name,))
+            self._conn.commit()
+            # Власний запис оновлює кеш напряму: при грубому mtime і незмінному розмірі
+            # файлу відбиток не змінюється; він потрібен лише для змін інших процесів
+            self._cache.pop(name, None)
+            if make_default:
+                self._default = name
+
+    def get(self, name=None):
+        """
+        Отримання ключів ідентичності
+
+        Args:
+            name: ім'я підписувача (None - ідентичність за замовчуванням)
+
+        Returns:
+            dict: ключі у форматі keys.json або None
+        """
+        with self._lock:
+            self._refresh()
+            name = name or self._default
+            if name is None:
+                return None
+
+            keys = self._cache.get(name)
+            if keys is None:
+                row = self._conn.execute(
+                    "SELECT name, private_key, public_key, private_key_hash "
+                    "FROM identities WHERE name=?", (name,)
+                ).fetchone()
+                if row is None:
+                    return None
+                keys = {
+                    "name": row[0],
+                    "private_key": int(row[1]),
+                    "public_key": int(row[2]),
+                    "private_key_hash": row[3]
+                }
+                self._cache[name] = keys
+            return keys
+
+    def set_default(self, name):
+        """Вибір підписувача за замовчуванням"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('default', ?)", (name,))
+            self._conn.commit()
+            self._default = name
+
+    def names(self):
+        """Список імен усіх ідентичностей"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM identities ORDER BY name")]
+
+    def close(self):
+        """Закриття з'єднання з базою"""
+        self._conn.close()
+
+
+class SchnorrSignatureSystem:
+    """
+    Підписи Шнорра над стандартною групою простого порядку (крива secp256k1).
+    Перевірка потребує лише публічного ключа, тому її можна передати третім особам.
+    """
+
+    # Параметри кривої secp256k1: y^2 = x^3 + 7 над полем FIELD_P
+    FIELD_P = 2 ** 256 - 2 ** 32 - 977
+    ORDER_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+    GENERATOR = (
+        0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+        0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
+    )
+    WINDOW_BITS = 4
+
+    def __init__(self):
+        self._base_table = None
+
+    # --- Арифметика точок у координатах Якобі (None - нескінченно віддалена точка) ---
+
+    def _double(self, point):
+        """Подвоєння точки"""
+        if point is None:
+            return None
+        p = self.FIELD_P
+        x, y, z = point
+        if y == 0:
+            return None
+        y_sq = y * y % p
+        s = 4 * x * y_sq % p
+        m = 3 * x * x % p
+        new_x = (m * m - 2 * s) % p
+        new_y = (m * (s - new_x) - 8 * y_sq * y_sq) % p
+        new_z = 2 * y * z % p
+        return new_x, new_y, new_z
+
+    def _add(self, first, second):
+        """Додавання двох точок"""
+        if first is None:
+            return second
+        if second is None:
+            return first
+        p = self.FIELD_P
+        x1, y1, z1 = first
+        x2, y2, z2 = second
+        z1_sq = z1 * z1 % p
+        z2_sq = z2 * z2 % p
+        u1 = x1 * z2_sq % p
+        u2 = x2 * z1_sq % p
+        s1 = y1 * z2_sq * z2 % p
+        s2 = y2 * z1_sq * z1 % p
+        if u1 == u2:
+            if s1 != s2:
+                return None
+            return self._double(first)
+        h = (u2 - u1) % p
+        r = (s2 - s1) % p
+        h_sq = h * h % p
+        h_cu = h_sq * h % p
+        u1_h_sq = u1 * h_sq % p
+        new_x = (r * r - h_cu - 2 * u1_h_sq) % p
+        new_y = (r * (u1_h_sq - new_x) - s1 * h_cu) % p
+        new_z = h * z1 * z2 % p
+        return new_x, new_y, new_z
+
+    def _add_affine(self, first, x2, y2):
+        """Додавання точки в координатах Якобі та афінної точки (z = 1)"""
+        if first is None:
+            return x2, y2, 1
+        p = self.FIELD_P
+        x1, y1, z1 = first
+        z1_sq = z1 * z1 % p
+        u2 = x2 * z1_sq % p
+        s2 = y2 * z1_sq * z1 % p
+        if x1 == u2:
+            if y1 != s2:
+                return None
+            return self._double(first)
+        h = (u2 - x1) % p
+        r = (s2 - y1) % p
+        h_sq = h * h % p
+        h_cu = h_sq * h % p
+        u1_h_sq = x1 * h_sq % p
+        new_x = (r * r - h_cu - 2 * u1_h_sq) % p
+        new_y = (r * (u1_h_sq - new_x) - y1 * h_cu) % p
+        new_z = h * z1 % p
+        return new_x, new_y, new_z
+
+    def _to_affine(self, point):
+        """Перетворення у афінні координати (x, y)"""
+        if point is None:
+            return None
+        p = self.FIELD_P
+        x, y, z = point
+        z_inv = pow(z, -1, p)
+        z_inv_sq = z_inv * z_inv % p
+        return x * z_inv_sq % p, y * z_inv_sq * z_inv % p
+
+    def _negate(self, affine):
+        """Протилежна точка"""
+        return affine[0], (-affine[1]) % self.FIELD_P
+
+    # --- Множення на скаляр ---
+
+    def _precompute_base_table(self):
+        """
+        Таблиця фіксованої бази: для кожного вікна i зберігаються
+        j * 2^(WINDOW_BITS * i) * G для j = 1..2^WINDOW_BITS - 1 (в афінних координатах)
+        """
+        if self._base_table is not None:
+            return self._base_table
+
+        size = 1 << self.WINDOW_BITS
+        windows = -(-self.ORDER_N.bit_length() // self.WINDOW_BITS)
+        table = []
+        base = (self.GENERATOR[0], self.GENERATOR[1], 1)
+        for _ in range(windows):
+            row = [None]
+            current = None
+            for _ in range(1, size):
+                current = self._add(current, base)
+                row.append(self._to_affine(current))
+            table.append(row)
+            for _ in range(self.WINDOW_BITS):
+                base = self._double(base)
+        self._base_table = table
+        return table
+
+    def _multiply_base(self, scalar):
+        """k * G через попередньо обчислену таблицю (лише додавання, без подвоєнь)"""
+        table = self._precompute_base_table()
+        mask = (1 << self.WINDOW_BITS) - 1
+        result = None
+        index = 0
+        while scalar:
+            digit = scalar & mask
+            if digit:
+                x, y = table[index][digit]
+                result = self._add_affine(result, x, y)
+            scalar >>= self.WINDOW_BITS
+            index += 1
+        return result
+
+    def _multi_multiply(self, scalars, points):
+        """
+        Мультискалярне множення sum(k_i * P_i) методом Піппенджера.
+        Вартість на одну точку зменшується зі зростанням кількості точок.
+        """
+        count = len(points)
+        if count == 0:
+            return None
+
+        window = max(2, min(16, count.bit_length() - 2))
+        mask = (1 << window) - 1
+        windows = -(-max(scalar.bit_length() for scalar in scalars) // window)
+
+        result = None
+        for index in range(windows - 1, -1, -1):
+            for _ in range(window):
+                result = self._double(result)
+
+            shift = index * window
+            buckets = [None] * (mask + 1)
+            for scalar, (x, y) in zip(scalars, points):
+                digit = (scalar >> shift) & mask
+                if digit:
+                    buckets[digit] = self._add_affine(buckets[digit], x, y)
+
+            # sum(j * bucket_j) через накопичувальну суму
+            running = None
+            window_sum = None
+            for digit in range(mask, 0, -1):
+                running = self._add(running, buckets[digit])
+                window_sum = self._add(window_sum, running)
+            result = self._add(result, window_sum)
+
+        return result
+
+    # --- Кодування ---
+
+    def _encode_point(self, affine):
+        """Стиснене кодування точки (33 байти)"""
+        x, y = affine
+        return bytes([2 + (y & 1)]) + x.to_bytes(32, 'big')
+
+    def _decode_point(self, data):
+        """Розкодування стисненої точки з перевіркою належності кривій"""
+        p = self.FIELD_P
+        if len(data) != 33 or data[0] not in (2, 3):
+            raise ValueError("Невірне кодування точки")
+        x = int.from_bytes(data[1:], 'big')
+        if x >= p:
+            raise ValueError("Невірне кодування точки")
+        y_sq = (pow(x, 3, p) + 7) % p
+        y = pow(y_sq, (p + 1) // 4, p)
+        if y * y % p != y_sq:
+            raise ValueError("Точка не належить кривій")
+        if (y & 1) != data[0] - 2:
+            y = p - y
+        return x, y
+
+    def _challenge(self, r_bytes, public_bytes, doc_hash):
+        """Виклик e = H(R || P || H(m)) mod n"""
+        digest = hashlib.sha256(r_bytes + public_bytes + doc_hash).digest()
+        return int.from_bytes(digest, 'big') % self.ORDER_N
+
+    # --- Ключі та підписи ---
+
+    def derive_keys(self, private_key_hash):
+        """
+        Отримання ключів Шнорра з хешу персональних даних (private_key_hash)
+
+        Returns:
+            tuple: (приватний_скаляр, публічний_ключ_hex)
+        """
+        secret = int(private_key_hash, 16) % (self.ORDER_N - 1) + 1
+        public_key = self._encode_point(self._to_affine(self._multiply_base(secret)))
+        return secret, public_key.hex()
+
+    @instrument("lab04.schnorr_sign", size_arg=1)
+    def sign(self, document_content, secret):
+        """
+        Створення підпису Шнорра
+
+        Args:
+            document_content: вміст документу (текст або байти)
+            secret: приватний скаляр з derive_keys
+
+        Returns:
+            str: підпис (hex, R || s)
+        """
+        if isinstance(document_content, str):
+            document_content = document_content.encode()
+        doc_hash = hashlib.sha256(document_content).digest()
+
+        public_bytes = self._encode_point(self._to_affine(self._multiply_base(secret)))
+
+        # Детермінований одноразовий ключ: нова пара (ключ, документ) - новий nonce
+        nonce_seed = hashlib.sha256(secret.to_bytes(32, 'big') + doc_hash).digest()
+        nonce = int.from_bytes(nonce_seed, 'big') % (self.ORDER_N - 1) + 1
+
+        r_bytes = self._encode_point(self._to_affine(self._multiply_base(nonce)))
+        challenge = self._challenge(r_bytes, public_bytes, doc_hash)
+        s = (nonce + challenge * secret) % self.ORDER_N
+
+        return (r_bytes + s.to_bytes(32, 'big')).hex()
+
+    def _parse(self, document_content, signature, public_key):
+        """Розбір підпису: (R, s, e, P) або ValueError"""
+        if isinstance(document_content, str):
+            document_content = document_content.encode()
+        raw = bytes.fromhex(signature)
+        if len(raw) != 65:
+            raise ValueError("Невірна довжина підпису")
+        public_bytes = bytes.fromhex(public_key)
+        r_point = self._decode_point(raw[:33])
+        public_point = self._decode_point(public_bytes)
+        s = int.from_bytes(raw[33:], 'big')
+        if s >= self.ORDER_N:
+            raise ValueError("Невірне значення s")
+        doc_hash = hashlib.sha256(document_content).digest()
+        challenge = self._challenge(raw[:33], public_bytes, doc_hash)
+        return r_point, s, challenge, public_point
+
+    @instrument("lab04.schnorr_verify", size_arg=1)
+    def verify(self, document_content, signature, public_key):
+        """
+        Перевірка підпису Шнорра лише за публічним ключем: s*G == R + e*P
+
+        Returns:
+            bool: True якщо підпис дійсний
+        """
+        try:
+            r_point, s, challenge, public_point = self._parse(document_content, signature, public_key)
+        except ValueError:
+            return False
+
+        left = self._multiply_base(s)
+        right = self._multi_multiply([1, challenge], [r_point, public_point])
+        return self._to_affine(left) == self._to_affine(right)
+
+    @instrument("lab04.schnorr_verify_batch")
+    def verify_batch(self, items):
+        """
+        Пакетна перевірка багатьох підписів одним мультискалярним множенням:
+        (sum a_i*s_i)*G == sum a_i*R_i + sum (a_i*e_i)*P_i з випадковими a_i
+
+        Args:
+            items: список кортежів (вміст_документу, підпис, публічний_ключ)
+
+        Returns:
+            bool: True якщо всі підписи дійсні
+        """
+        n = self.ORDER_N
+        base_scalar = 0
+        scalars = []
+        points = []
+        try:
+            for document_content, signature, public_key in items:
+                r_point, s, challenge, public_point = self._parse(document_content, signature, public_key)
+                weight = secrets.randbits(128) | 1
+                base_scalar = (base_scalar + weight * s) % n
+                scalars.extend([weight, weight * challenge % n])
+                points.extend([r_point, public_point])
+        except ValueError:
+            return False
+
+        left = self._multiply_base(base_scalar)
+        right = self._multi_multiply(scalars, points)
+        return self._to_affine(left) == self._to_affine(right)
+
+
+class SignatureBundle:
+    """
+    Бінарний пакет підписів замість окремого файлу .sig на кожен документ.
+
+    Формат: заголовок (магічне слово, версія, ширина запису), далі сегменти.
+    Кожен сегмент: заголовок, відсортований індекс шляхів, записи підписів
+    фіксованої ширини та блок шляхів. Нові підписи дописуються окремим
+    сегментом у кінець файлу; новіші сегменти мають пріоритет.
+    Уже записані сегменти ніколи не змінюються на місці: коли сегментів стає
+    більше MAX_SEGMENTS, хвостові сегменти зливаються (як у LSM-дереві) у
+    тимчасовий файл, який атомарно замінює пакет, тож сегментів не більше MAX_SEGMENTS + 1.
+    """
+
+    MAGIC = b"SIGBNDL1"
+    HEADER = struct.Struct(">8sHH")
+    SEGMENT_MAGIC = b"SEGM"
+    SEGMENT_HEADER = struct.Struct(">4sII")
+    INDEX_ENTRY = struct.Struct(">IH")
+    VERSION = 1
+    MAX_SEGMENTS = 32
+
+    def __init__(self, bundle_file="signatures.bundle", record_width=32):
+        self.bundle_file = bundle_file
+        self._file = None
+        self._mmap = None
+        self._segments = []
+        self._end = self.HEADER.size
+
+        if not os.path.exists(bundle_file):
+            with open(bundle_file, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, record_width))
+
+        self._file = open(bundle_file, 'rb')
+        magic, version, width = self.HEADER.unpack(self._file.read(self.HEADER.size))
+        if magic != self.MAGIC or version != self.VERSION:
+            self._file.close()
+            raise ValueError(f"'{bundle_file}' не є пакетом підписів")
+        self.record_width = width
+        self._remap()
+
+    def _remap(self):
+        """
+        Повторне відображення файлу в пам'ять і читання заголовків сегментів.
+        Недописаний останній сегмент (збій під час append) ігнорується.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._segments = []
+        self._end = self.HEADER.size
+
+        size = os.fstat(self._file.fileno()).st_size
+        if size == self.HEADER.size:
+            return
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = self.HEADER.size
+        while offset + self.SEGMENT_HEADER.size <= size:
+            magic, count, paths_size = self.SEGMENT_HEADER.unpack_from(self._mmap, offset)
+            if magic != self.SEGMENT_MAGIC:
+                raise ValueError(f"Пошкоджений сегмент у '{self.bundle_file}' (зсув {offset})")
+            index_start = offset + self.SEGMENT_HEADER.size
+            records_start = index_start + count * self.INDEX_ENTRY.size
+            paths_start = records_start + count * self.record_width
+            if paths_start + paths_size > size:
+                break
+            self._segments.append((count, index_start, records_start, paths_start, offset))
+            offset = self._end = paths_start + paths_size
+
+    @staticmethod
+    def _key(path):
+        """Шлях у вигляді ключа пакету"""
+        return path.replace(os.sep, "/").encode('utf-8')
+
+    def _path_at(self, segment, position):
+        """Шлях запису з номером position у сегменті"""
+        _, index_start, _, paths_start, _ = segment
+        path_offset, path_len = self.INDEX_ENTRY.unpack_from(
+            self._mmap, index_start + position * self.INDEX_ENTRY.size
+        )
+        start = paths_start + path_offset
+        return self._mmap[start:start + path_len]
+
+    def lookup(self, path):
+        """
+        Пошук підпису за шляхом (двійковий пошук у відображеному файлі)
+
+        Returns:
+            bytes: запис підпису або None
+        """
+        key = self._key(path)
+        for segment in reversed(self._segments):
+            low, high = 0, segment[0]
+            while low < high:
+                middle = (low + high) // 2
+                if self._path_at(segment, middle) < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low < segment[0] and self._path_at(segment, low) == key:
+                start = segment[2] + low * self.record_width
+                return self._mmap[start:start + self.record_width]
+        return None
+
+    def _segment_items(self, segment):
+        """Записи одного сегмента {ключ: підпис}"""
+        result = {}
+        for position in range(segment[0]):
+            start = segment[2] + position * self.record_width
+            result[bytes(self._path_at(segment, position))] = self._mmap[start:start + self.record_width]
+        return result
+
+    def _pack_segment(self, records):
+        """Сегмент у двійковому вигляді з записів {ключ: підпис}"""
+        items = sorted(records.items())
+        index = bytearray()
+        data = bytearray()
+        paths = bytearray()
+        for key, record in items:
+            if len(record) != self.record_width:
+                raise ValueError(f"Запис підпису має бути {self.record_width} байт")
+            index += self.INDEX_ENTRY.pack(len(paths), len(key))
+            data += record
+            paths += key
+        return self.SEGMENT_HEADER.pack(self.SEGMENT_MAGIC, len(items), len(paths)) + index + data + paths
+
+    def append(self, signatures):
+        """
+        Дописування нових підписів сегментом у кінець файлу.
+        Записані раніше сегменти не змінюються, тож збій під час запису
+        може зіпсувати лише новий сегмент. Коли сегментів більше MAX_SEGMENTS,
+        хвостові сегменти зливаються окремим кроком (_merge_tail).
+
+        Args:
+            signatures: словник {шлях: підпис (bytes довжиною record_width)}
+        """
+        if not signatures:
+            return
+
+        segment = self._pack_segment({self._key(path): record for path, record in signatures.items()})
+        end = self._end
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        with open(self.bundle_file, 'r+b') as f:
+            # Запис після останнього цілого сегмента: залишки недописаного сегмента перезаписуються
+            f.seek(end)
+            f.write(segment)
+            f.truncate()
+
+        self._remap()
+        if len(self._segments) > self.MAX_SEGMENTS:
+            self._merge_tail()
+
+    def _merge_tail(self):
+        """
+        Злиття хвостових сегментів: з кінця набираються сегменти, не більші
+        за вже накопичене злиття, і переписуються одним сегментом
+        """
+        first = len(self._segments) - 1
+        merged = self._segment_items(self._segments[first])
+        while first > 0 and self._segments[first - 1][0] <= len(merged):
+            first -= 1
+            merged = {**self._segment_items(self._segments[first]), **merged}
+        if first < len(self._segments) - 1:
+            self._rewrite(first, merged)
+
+    def _rewrite(self, first, records):
+        """
+        Заміна сегментів, починаючи з номера first, одним сегментом records.
+        Новий вміст пишеться у тимчасовий файл і атомарно замінює пакет (os.replace),
+        тож збій посередині не зачіпає вже записаних підписів.
+        """
+        keep_until = self._segments[first][4] if first < len(self._segments) else self._end
+        segment = self._pack_segment(records) if records else b""
+
+        temp_file = self.bundle_file + ".tmp"
+        with open(temp_file, 'wb') as f:
+            if self._mmap is not None:
+                with memoryview(self._mmap) as view:
+                    f.write(view[:keep_until])
+            else:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.record_width))
+            f.write(segment)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.close()
+        os.replace(temp_file, self.bundle_file)
+        self._file = open(self.bundle_file, 'rb')
+        self._remap()
+
+    def items(self):
+        """Усі актуальні записи {шлях: підпис} (новіші сегменти перекривають старі)"""
+        result = {}
+        for segment in self._segments:
+            for key, record in self._segment_items(segment).items():
+                result[key.decode('utf-8')] = record
+        return result
+
+    def compact(self):
+        """Злиття всіх сегментів в один (через тимчасовий файл)"""
+        merged = {}
+        for segment in self._segments:
+            merged.update(self._segment_items(segment))
+        self._rewrite(0, merged)
+
+    def close(self):
+        """Закриття відображення та файлу"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 
 class DigitalSignatureSystem:
@@ -10,6 +793,24 @@ class DigitalSignatureSystem:
         self.MODULO = 1000007
         self.PUBLIC_KEY_MULTIPLIER = 7
         self.keys_file = "keys.json"
+        self.keystore_file = "keystore.db"
+        self.keystore = None
+        self.active_identity = None
+        self.manifest_file = "manifest.json"
+        self.bundle_file = "signatures.bundle"
+        self.chunk_size = 1024 * 1024
+        self.hash_algorithm = "sha256"
+        self.hash_cache = None
+        self.schnorr = SchnorrSignatureSystem()
+
+    def schnorr_keys(self, keys):
+        """Ключі Шнорра для збереженої ідентичності: (приватний_скаляр, публічний_ключ_hex)"""
+        return self.schnorr.derive_keys(keys['private_key_hash'])
+
+    def enable_hash_cache(self, db_file="hash_cache.db"):
+        """Увімкнення постійного кешу хешів файлів"""
+        self.hash_cache = HashCache(db_file)
+        return self.hash_cache
 
     def generate_keys(self, name, birthdate, secret_word):
         """
@@ -35,86 +836,583 @@ class DigitalSignatureSystem:
 
         return private_key, public_key, private_key_hash
 
+    def _open_keystore(self, create):
+        """
+        Відкриття сховища ключів.
+        Старий keys.json імпортується у сховище при першому відкритті.
+        """
+        if self.keystore is not None:
+            return self.keystore
+
+        if not create and not os.path.exists(self.keystore_file) and not os.path.exists(self.keys_file):
+            return None
+
+        self.keystore = KeyStore(self.keystore_file)
+
+        if not self.keystore.names() and os.path.exists(self.keys_file):
+            with open(self.keys_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            self.keystore.put(legacy["name"], legacy["private_key"],
+                              legacy["public_key"], legacy["private_key_hash"])
+
+        return self.keystore
+
     def save_keys(self, name, private_key, public_key, private_key_hash):
-        """Збереження ключів у файл"""
-        keys_data = {
-            "name": name,
-            "private_key": private_key,
-            "public_key": public_key,
-            "private_key_hash": private_key_hash
-        }
-        with open(self.keys_file, 'w', encoding='utf-8') as f:
-            json.dump(keys_data, f, ensure_ascii=False, indent=4)
+        """Збереження ключів у сховище (нова ідентичність стає активною)"""
+        self._open_keystore(create=True).put(name, private_key, public_key, private_key_hash)
+        self.active_identity = name
+
+    def load_keys(self, name=None):
+        """
+        Завантаження ключів зі сховища
+
+        Args:
+            name: ім'я підписувача (None - активна ідентичність)
 
-    def load_keys(self):
-        """Завантаження ключів з файлу"""
-        if not os.path.exists(self.keys_file):
+        Returns:
+            dict: ключі або None
+        """
+        keystore = self._open_keystore(create=False)
+        if keystore is None:
             return None
 
-        with open(self.keys_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return keystore.get(name or self.active_identity)
+
+    def list_identities(self):
+        """Список усіх збережених підписувачів"""
+        keystore = self._open_keystore(create=False)
+        return keystore.names() if keystore else []
 
-    def calculate_document_hash(self, document_content):
+    def select_identity(self, name):
+        """
+        Вибір підписувача за ім'ям
+
+        Returns:
+            bool: True якщо ідентичність знайдено
+        """
+        keystore = self._open_keystore(create=False)
+        if keystore is None or keystore.get(name) is None:
+            return False
+
+        keystore.set_default(name)
+        self.active_identity = name
+        return True
+
+    @instrument("lab04.document_hash", size_arg=1)
+    def calculate_document_hash(self, document_content, algorithm=None):
         """
         Обчислення хешу документу
 
         Args:
             document_content: вміст документу (текст або байти)
+            algorithm: назва алгоритму з HASH_BACKENDS (None - hash_algorithm системи)
 
         Returns:
-            str: SHA256 хеш документу
+            str: хеш документу (hex)
         """
         if isinstance(document_content, str):
             document_content = document_content.encode()
 
-        return hashlib.sha256(document_content).hexdigest()
+        return get_hash_backend(algorithm or self.hash_algorithm)(document_content).hexdigest()
+
+    @instrument("lab04.file_hash")
+    def calculate_file_hash(self, file_path, paranoid=False, algorithm=None):
+        """
+        Обчислення хешу файлу частинами (без читання всього файлу в пам'ять)
+
+        Args:
+            file_path: шлях до файлу
+            paranoid: True - ігнорувати кеш і завжди перераховувати хеш
+            algorithm: назва алгоритму з HASH_BACKENDS (None - hash_algorithm системи)
+
+        Returns:
+            str: хеш файлу (hex)
+        """
+        algorithm = algorithm or self.hash_algorithm
+        cache = self.hash_cache
+        if cache is not None:
+            stat_result = os.stat(file_path)
+            if not paranoid:
+                cached_hash = cache.get(stat_result, algorithm)
+                if cached_hash is not None:
+                    return cached_hash
+
+        hasher = get_hash_backend(algorithm)()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                hasher.update(chunk)
+        file_hash = hasher.hexdigest()
+
+        if cache is not None:
+            cache.put(stat_result, file_path, file_hash, algorithm)
+
+        return file_hash
 
-    def create_signature(self, document_content, private_key):
+    def parse_signature(self, signature):
+        """
+        Розбір заголовка підпису
+
+        Args:
+            signature: підпис у форматі "v1:<алгоритм>:<hex>" або старий "0x..." (SHA256)
+
+        Returns:
+            tuple: (алгоритм, підпис_hex)
+        """
+        if ":" not in signature:
+            return "sha256", signature
+
+        version, algorithm, signature_hex = signature.split(":", 2)
+        if version != SIGNATURE_VERSION:
+            raise ValueError(f"Непідтримувана версія підпису: {version}")
+        get_hash_backend(algorithm)
+        return algorithm, signature_hex
+
+    @instrument("lab04.sign_hash")
+    def _sign_hash(self, doc_hash, private_key, algorithm):
+        """Підпис готового хешу з заголовком алгоритму"""
+        # "Шифруємо" хеш приватним ключем (спрощене шифрування через XOR)
+        signature = int(doc_hash, 16) ^ private_key
+        return f"{SIGNATURE_VERSION}:{algorithm}:{hex(signature)}"
+
+    @instrument("lab04.check_hash")
+    def _check_hash(self, current_hash, signature_hex, private_key):
+        """Порівняння хешу документу з "розшифрованим" підписом"""
+        decrypted_hash = hex(int(signature_hex, 16) ^ private_key)[2:].zfill(len(current_hash))
+        return decrypted_hash == current_hash
+
+    @instrument("lab04.create_signature", size_arg=1)
+    def create_signature(self, document_content, private_key, algorithm=None):
         """
         Створення цифрового підпису
 
         Args:
             document_content: вміст документу
             private_key: приватний ключ
+            algorithm: назва алгоритму з HASH_BACKENDS (None - hash_algorithm системи)
 
         Returns:
-            str: цифровий підпис (hex)
+            str: цифровий підпис з заголовком ("v1:<алгоритм>:<hex>")
         """
-        # Обчислюємо хеш документу
-        doc_hash = self.calculate_document_hash(document_content)
+        algorithm = algorithm or self.hash_algorithm
 
-        # Конвертуємо хеш у число
-        hash_number = int(doc_hash, 16)
-
-        # "Шифруємо" хеш приватним ключем (спрощене шифрування через XOR)
-        signature = hash_number ^ private_key
+        # Обчислюємо хеш документу
+        doc_hash = self.calculate_document_hash(document_content, algorithm)
 
-        return hex(signature)
+        return self._sign_hash(doc_hash, private_key, algorithm)
 
+    @instrument("lab04.verify_signature", size_arg=1)
     def verify_signature(self, document_content, signature, private_key):
         """
         Перевірка цифрового підпису
 
         Args:
             document_content: вміст документу
-            signature: цифровий підпис
+            signature: цифровий підпис (алгоритм хешування береться з заголовка)
             private_key: приватний ключ (для розшифрування)
 
         Returns:
             bool: True якщо підпис дійсний, False якщо підроблений
         """
-        # Обчислюємо хеш поточного документу
-        current_hash = self.calculate_document_hash(document_content)
+        algorithm, signature_hex = self.parse_signature(signature)
 
-        # Конвертуємо підпис назад у число
-        signature_number = int(signature, 16)
+        # Обчислюємо хеш поточного документу тим самим алгоритмом
+        current_hash = self.calculate_document_hash(document_content, algorithm)
 
-        # "Розшифровуємо" підпис приватним ключем
-        decrypted_hash_number = signature_number ^ private_key
-        decrypted_hash = hex(decrypted_hash_number)[2:].zfill(64)
+        return self._check_hash(current_hash, signature_hex, private_key)
 
-        # Порівнюємо хеші
-        return decrypted_hash == current_hash
+    def _bundle_key(self, file_path):
+        """Шлях документу відносно каталогу пакету підписів"""
+        bundle_dir = os.path.dirname(os.path.abspath(self.bundle_file))
+        return os.path.relpath(os.path.abspath(file_path), bundle_dir)
+
+    def save_signature_to_bundle(self, file_paths_signatures):
+        """
+        Збереження підписів у бінарний пакет одним дописаним сегментом.
+        Запис: 1 байт ідентифікатора алгоритму + 64 байти підпису.
+
+        Args:
+            file_paths_signatures: словник {шлях_до_файлу: підпис}
+        """
+        bundle = SignatureBundle(self.bundle_file, record_width=65)
+        try:
+            records = {}
+            for path, signature in file_paths_signatures.items():
+                algorithm, signature_hex = self.parse_signature(signature)
+                algorithm_id = HASH_BACKENDS[algorithm][0]
+                records[self._bundle_key(path)] = (
+                    bytes([algorithm_id]) + int(signature_hex, 16).to_bytes(64, 'big')
+                )
+            bundle.append(records)
+        finally:
+            bundle.close()
+
+    def load_signature_from_bundle(self, file_path, bundle=None):
+        """
+        Пошук підпису документу в пакеті
+
+        Args:
+            file_path: шлях до документу
+            bundle: відкритий SignatureBundle (щоб один файл обслуговував усі перевірки)
+
+        Returns:
+            str: підпис (hex) або None
+        """
+        own_bundle = bundle is None
+        if own_bundle:
+            if not os.path.exists(self.bundle_file):
+                return None
+            bundle = SignatureBundle(self.bundle_file)
+        try:
+            record = bundle.lookup(self._bundle_key(file_path))
+        finally:
+            if own_bundle:
+                bundle.close()
+
+        if record is None:
+            return None
+        if len(record) == 32:
+            # Пакет старого формату: лише SHA256 без заголовка
+            return hex(int.from_bytes(record, 'big'))
+
+        algorithm = next((name for name, (algorithm_id, _) in HASH_BACKENDS.items()
+                          if algorithm_id == record[0]), None)
+        if algorithm is None:
+            raise ValueError(f"Невідомий ідентифікатор алгоритму у пакеті: {record[0]}")
+        return f"{SIGNATURE_VERSION}:{algorithm}:{hex(int.from_bytes(record[1:], 'big'))}"
+
+    def verify_bundle(self, private_key, file_paths=None, workers=None):
+        """
+        Пакетна перевірка документів за пакетом підписів.
+        Файл пакету відкривається і відображається в пам'ять один раз на всі перевірки.
+
+        Args:
+            private_key: приватний ключ
+            file_paths: список документів (None - усі документи з пакету)
+            workers: кількість потоків хешування (None - за замовчуванням)
+
+        Returns:
+            tuple: (кількість_перевірених_файлів, список_помилок)
+                   помилка - словник {"path": ..., "reason": ...}
+        """
+        if not os.path.exists(self.bundle_file):
+            raise FileNotFoundError(f"Пакет підписів '{self.bundle_file}' не знайдено")
+
+        failures = []
+        by_algorithm = {}
+        bundle = SignatureBundle(self.bundle_file)
+        try:
+            if file_paths is None:
+                bundle_dir = os.path.dirname(os.path.abspath(self.bundle_file))
+                file_paths = [os.path.join(bundle_dir, path) for path in bundle.items()]
+            for path in file_paths:
+                try:
+                    signature = self.load_signature_from_bundle(path, bundle)
+                    if signature is None:
+                        failures.append({"path": path, "reason": "підпис відсутній у пакеті"})
+                        continue
+                    algorithm, signature_hex = self.parse_signature(signature)
+                except ValueError as e:
+                    failures.append({"path": path, "reason": f"пошкоджений запис: {e}"})
+                    continue
+                by_algorithm.setdefault(algorithm, {})[path] = signature_hex
+        finally:
+            bundle.close()
+
+        for algorithm, signatures in by_algorithm.items():
+            hashes = self._hash_tree("", list(signatures), workers, algorithm=algorithm)
+            for path, signature_hex in signatures.items():
+                current_hash = hashes[path]
+                if isinstance(current_hash, Exception):
+                    failures.append({"path": path, "reason": f"не вдалося прочитати: {current_hash}"})
+                elif not self._check_hash(current_hash, signature_hex, private_key):
+                    failures.append({"path": path, "reason": "підпис не відповідає документу"})
+
+        return len(file_paths), failures
+
+    def _merkle_leaf(self, file_path, index, chunk_size):
+        """Хеш листа дерева Меркла (один фрагмент файлу)"""
+        with open(file_path, 'rb') as f:
+            f.seek(index * chunk_size)
+            chunk = f.read(chunk_size)
+        return hashlib.sha256(b"\x00" + chunk).digest()
+
+    @staticmethod
+    def _merkle_parent(left, right):
+        """Хеш внутрішнього вузла дерева Меркла"""
+        return hashlib.sha256(b"\x01" + left + right).digest()
+
+    def _merkle_levels(self, leaves):
+        """Побудова всіх рівнів дерева від листів до кореня"""
+        levels = [leaves]
+        while len(levels[-1]) > 1:
+            level = levels[-1]
+            parents = []
+            for i in range(0, len(level) - 1, 2):
+                parents.append(self._merkle_parent(level[i], level[i + 1]))
+            if len(level) % 2:
+                # Непарний вузол переноситься на рівень вище без змін
+                parents.append(level[-1])
+            levels.append(parents)
+        return levels
+
+    def _hash_chunks(self, file_path, indexes, chunk_size, workers=None):
+        """Паралельне хешування вибраних фрагментів файлу"""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(
+                lambda index: self._merkle_leaf(file_path, index, chunk_size), indexes
+            ))
+
+    @instrument("lab04.create_merkle_signature")
+    def create_merkle_signature(self, file_path, private_key, chunk_size=None, workers=None):
+        """
+        Створення підпису великого файлу через дерево Меркла.
+        Фрагменти хешуються паралельно, підписується лише корінь дерева.
+
+        Args:
+            file_path: шлях до файлу
+            private_key: приватний ключ
+            chunk_size: розмір фрагмента в байтах (за замовчуванням chunk_size системи)
+            workers: кількість потоків (None - за замовчуванням)
+
+        Returns:
+            dict: дерево (для збереження у файл .merkle) з підписом кореня
+        """
+        chunk_size = chunk_size or self.chunk_size
+        file_size = os.path.getsize(file_path)
+        chunk_count = max(1, -(-file_size // chunk_size))
+
+        leaves = self._hash_chunks(file_path, range(chunk_count), chunk_size, workers)
+        levels = self._merkle_levels(leaves)
+        root = levels[-1][0].hex()
+
+        return {
+            "chunk_size": chunk_size,
+            "file_size": file_size,
+            "root": root,
+            "signature": hex(int(root, 16) ^ private_key),
+            "levels": [[node.hex() for node in level] for level in levels]
+        }
+
+    def save_merkle_tree(self, file_path, tree):
+        """Збереження дерева Меркла у супровідний файл"""
+        tree_file = file_path + ".merkle"
+        with open(tree_file, 'w', encoding='utf-8') as f:
+            json.dump(tree, f, indent=4)
+        return tree_file
+
+    def load_merkle_tree(self, file_path):
+        """Завантаження дерева Меркла із супровідного файлу"""
+        tree_file = file_path + ".merkle"
+        if not os.path.exists(tree_file):
+            return None
+
+        with open(tree_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _merkle_root_is_signed(self, tree, private_key):
+        """Перевірка, що корінь дерева відповідає підпису та рівням дерева"""
+        decrypted_root = hex(int(tree["signature"], 16) ^ private_key)[2:].zfill(64)
+        return decrypted_root == tree["root"] == tree["levels"][-1][0]
+
+    @instrument("lab04.verify_merkle_signature")
+    def verify_merkle_signature(self, file_path, tree, private_key, workers=None):
+        """
+        Перевірка підпису дерева Меркла з паралельним хешуванням фрагментів
+
+        Args:
+            file_path: шлях до файлу
+            tree: дерево, створене create_merkle_signature
+            private_key: приватний ключ
+            workers: кількість потоків (None - за замовчуванням)
+
+        Returns:
+            tuple: (True/False, список_номерів_змінених_фрагментів)
+        """
+        if not self._merkle_root_is_signed(tree, private_key):
+            return False, []
+
+        chunk_size = tree["chunk_size"]
+        stored_leaves = tree["levels"][0]
+        file_size = os.path.getsize(file_path)
+        chunk_count = max(1, -(-file_size // chunk_size))
+
+        leaves = self._hash_chunks(file_path, range(chunk_count), chunk_size, workers)
+
+        modified = [index for index, leaf in enumerate(leaves)
+                    if index >= len(stored_leaves) or leaf.hex() != stored_leaves[index]]
+        # Фрагменти, які зникли після скорочення файлу
+        modified.extend(range(chunk_count, len(stored_leaves)))
+
+        # Дерево могло бути підроблене - корінь перераховується з листів
+        levels = self._merkle_levels([bytes.fromhex(leaf) for leaf in stored_leaves])
+        if levels[-1][0].hex() != tree["root"]:
+            return False, modified
+
+        is_valid = not modified and file_size == tree["file_size"]
+        return is_valid, modified
+
+    def verify_merkle_range(self, file_path, tree, private_key, offset, length):
+        """
+        Перевірка лише діапазону байтів файлу за O(log n) хешувань на фрагмент
+
+        Args:
+            file_path: шлях до файлу
+            tree: дерево, створене create_merkle_signature
+            private_key: приватний ключ
+            offset: початок діапазону (байти)
+            length: довжина діапазону (байти)
+
+        Returns:
+            bool: True якщо всі фрагменти діапазону не змінювались
+        """
+        if not self._merkle_root_is_signed(tree, private_key):
+            return False
+
+        chunk_size = tree["chunk_size"]
+        if offset < 0 or length <= 0 or offset + length > tree["file_size"]:
+            return False
+
+        levels = tree["levels"]
+        first = offset // chunk_size
+        last = (offset + length - 1) // chunk_size
+
+        for index in range(first, last + 1):
+            node = self._merkle_leaf(file_path, index, chunk_size)
+            position = index
+            # Підйом до кореня: з hex декодуються лише сусідні вузли на шляху
+            for level in levels[:-1]:
+                if position % 2:
+                    node = self._merkle_parent(bytes.fromhex(level[position - 1]), node)
+                elif position + 1 < len(level):
+                    node = self._merkle_parent(node, bytes.fromhex(level[position + 1]))
+                position //= 2
+            if node.hex() != tree["root"]:
+                return False
+
+        return True
+
+    def _list_tree(self, root_dir):
+        """
+        Список файлів каталогу (відносні шляхи, відсортовані).
+        Пропускається лише сам маніфест у корені каталогу: файли .sig, manifest.json
+        тощо у підкаталогах - звичайні документи і теж підписуються.
+        """
+        manifest_path = self.manifest_file.replace(os.sep, "/")
+        paths = []
+        for dir_path, dir_names, file_names in os.walk(root_dir):
+            dir_names.sort()
+            for file_name in file_names:
+                full_path = os.path.join(dir_path, file_name)
+                rel_path = os.path.relpath(full_path, root_dir).replace(os.sep, "/")
+                if rel_path != manifest_path:
+                    paths.append(rel_path)
+        return sorted(paths)
+
+    def _hash_tree(self, root_dir, rel_paths, workers=None, paranoid=False, algorithm=None):
+        """
+        Паралельне хешування файлів у пулі потоків.
+        hashlib звільняє GIL на великих буферах, тому потоки дають реальний приріст.
+
+        Returns:
+            dict: {відносний_шлях: хеш або виняток}
+        """
+        def job(rel_path):
+            try:
+                return self.calculate_file_hash(os.path.join(root_dir, rel_path), paranoid, algorithm)
+            except OSError as e:
+                return e
+
+        cache = self.hash_cache
+        with cache.batch() if cache is not None else contextlib.nullcontext():
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return dict(zip(rel_paths, pool.map(job, rel_paths)))
+
+    @instrument("lab04.sign_tree")
+    def sign_tree(self, root_dir, private_key, workers=None):
+        """
+        Пакетне підписання всіх файлів каталогу
+
+        Args:
+            root_dir: каталог з документами
+            private_key: приватний ключ
+            workers: кількість потоків (None - за замовчуванням)
+
+        Returns:
+            str: шлях до збереженого маніфесту
+        """
+        algorithm = self.hash_algorithm
+        hashes = self._hash_tree(root_dir, self._list_tree(root_dir), workers, algorithm=algorithm)
+
+        entries = []
+        for rel_path, doc_hash in hashes.items():
+            if isinstance(doc_hash, Exception):
+                raise doc_hash
+            entries.append({
+                "path": rel_path,
+                "hash": doc_hash,
+                "signature": self._sign_hash(doc_hash, private_key, algorithm)
+            })
+
+        manifest_path = os.path.join(root_dir, self.manifest_file)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({"algorithm": algorithm, "files": entries}, f, ensure_ascii=False, indent=4)
+
+        return manifest_path
+
+    @instrument("lab04.verify_tree")
+    def verify_tree(self, root_dir, private_key, workers=None, paranoid=False):
+        """
+        Пакетна перевірка каталогу за маніфестом.
+        Перевірка не зупиняється на першій помилці - повертаються всі проблеми.
+
+        Args:
+            root_dir: каталог з документами
+            private_key: приватний ключ
+            workers: кількість потоків (None - за замовчуванням)
+            paranoid: True - перераховувати хеші навіть для файлів з кешу
+
+        Returns:
+            tuple: (кількість_перевірених_файлів, список_помилок)
+                   помилка - словник {"path": ..., "reason": ...}
+        """
+        manifest_path = os.path.join(root_dir, self.manifest_file)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        entries = manifest["files"]
+        default_algorithm = manifest.get("algorithm", "sha256")
+
+        # Алгоритм береться із заголовка підпису кожного запису; пошкоджений запис
+        # потрапляє у звіт і не зупиняє перевірку решти файлів
+        failures = []
+        by_algorithm = {}
+        for entry in entries:
+            try:
+                signature = entry["signature"]
+                if ":" in signature:
+                    algorithm, signature_hex = self.parse_signature(signature)
+                else:
+                    algorithm, signature_hex = default_algorithm, signature
+                int(signature_hex, 16)
+            except (ValueError, KeyError) as e:
+                failures.append({"path": entry.get("path"), "reason": f"пошкоджений запис: {e}"})
+                continue
+            by_algorithm.setdefault(algorithm, {})[entry["path"]] = signature_hex
+
+        for algorithm, signatures in by_algorithm.items():
+            hashes = self._hash_tree(root_dir, list(signatures), workers, paranoid, algorithm)
+            for rel_path, signature_hex in signatures.items():
+                current_hash = hashes[rel_path]
+                if isinstance(current_hash, Exception):
+                    failures.append({"path": rel_path, "reason": f"не вдалося прочитати: {current_hash}"})
+                elif not self._check_hash(current_hash, signature_hex, private_key):
+                    failures.append({"path": rel_path, "reason": "підпис не відповідає документу"})
+
+        # Нові файли, яких немає у маніфесті
+        signed_paths = {entry.get("path") for entry in entries}
+        for rel_path in sorted(set(self._list_tree(root_dir)) - signed_paths):
+            failures.append({"path": rel_path, "reason": "файл відсутній у маніфесті"})
+
+        return len(entries), failures
 
 
 def show_menu():
@@ -125,7 +1423,14 @@ def show_menu():
     print("1. Згенерувати ключ")
     print("2. Підписати документ")
     print("3. Перевірити підпис")
-    print("4. Завершити програму")
+    print("4. Підписати каталог (маніфест)")
+    print("5. Перевірити каталог (маніфест)")
+    print("6. Підписати великий файл (дерево Меркла)")
+    print("7. Перевірити великий файл (дерево Меркла)")
+    print("8. Вибрати підписувача")
+    print("9. Підписати документ (Шнорр)")
+    print("10. Перевірити підпис (Шнорр, лише публічний ключ)")
+    print("11. Завершити програму")
     print("=" * 70)
 
 
@@ -150,11 +1455,12 @@ def generate_key_menu(dss):
     private_key, public_key, private_key_hash = dss.generate_keys(name, birthdate, secret_word)
     dss.save_keys(name, private_key, public_key, private_key_hash)
 
-    print("\nКлючі успішно згенеровані та збережені!")
+    print("\nКлючі успішно згенеровані та збережені у сховище!")
     print(f"Ім'я: {name}")
     print(f"Хеш персональних даних (SHA256): {private_key_hash}")
     print(f"Приватний ключ: {private_key}")
     print(f"Публічний ключ: {public_key}")
+    print(f"Публічний ключ Шнорра: {dss.schnorr.derive_keys(private_key_hash)[1]}")
 
 
 def sign_document_menu(dss):
@@ -178,25 +1484,34 @@ def sign_document_menu(dss):
         print(f"\nПомилка: Файл '{file_path}' не знайдено!")
         return
 
+    # Вибір алгоритму хешування
+    print(f"Доступні алгоритми: {', '.join(HASH_BACKENDS)}")
+    algorithm = input(f"Алгоритм хешування (Enter - {dss.hash_algorithm}): ").strip() or dss.hash_algorithm
+
+    if algorithm not in HASH_BACKENDS:
+        print(f"\nПомилка: Невідомий алгоритм '{algorithm}'!")
+        return
+
     try:
-        # Читання файлу
-        with open(file_path, 'rb') as f:
-            document_content = f.read()
+        # Хеш обчислюється один раз (потоково) і використовується і для підпису, і для звіту
+        doc_hash = dss.calculate_file_hash(file_path, algorithm=algorithm)
 
         # Створення підпису
-        signature = dss.create_signature(document_content, keys['private_key'])
+        signature = dss._sign_hash(doc_hash, keys['private_key'], algorithm)
 
         # Збереження підпису
-        signature_file = file_path + ".sig"
-        with open(signature_file, 'w') as f:
-            f.write(signature)
-
-        # Обчислення хешу
-        doc_hash = dss.calculate_document_hash(document_content)
+        to_bundle = input(f"Зберегти підпис у пакет '{dss.bundle_file}'? (y/n): ").strip()
+        if to_bundle.lower() == 'y':
+            dss.save_signature_to_bundle({file_path: signature})
+            signature_file = dss.bundle_file
+        else:
+            signature_file = file_path + ".sig"
+            with open(signature_file, 'w') as f:
+                f.write(signature)
 
         print("\nДокумент успішно підписано!")
         print(f"Файл документу: {file_path}")
-        print(f"Хеш документу (SHA256): {doc_hash}")
+        print(f"Хеш документу ({algorithm}): {doc_hash}")
         print(f"Цифровий підпис: {signature}")
         print(f"Підпис збережено у файл: {signature_file}")
 
@@ -204,6 +1519,27 @@ def sign_document_menu(dss):
         print(f"\nПомилка при підписанні документу: {e}")
 
 
+def verify_bundle_report(dss, keys):
+    """Перевірка всіх документів із пакету підписів і виведення звіту"""
+    try:
+        count, failures = dss.verify_bundle(keys['private_key'])
+    except (OSError, ValueError) as e:
+        print(f"\nПомилка при перевірці пакету: {e}")
+        return
+
+    print("\n" + "=" * 70)
+    print("РЕЗУЛЬТАТ ПЕРЕВІРКИ ПАКЕТУ")
+    print("=" * 70)
+    print(f"Перевірено документів: {count}")
+    if failures:
+        print(f"Проблем: {len(failures)}")
+        for failure in failures:
+            print(f"  - {failure['path']}: {failure['reason']}")
+    else:
+        print("Усі підписи ДІЙСНІ")
+    print("=" * 70)
+
+
 def verify_signature_menu(dss):
     """Меню перевірки підпису"""
     print("\n" + "-" * 70)
@@ -219,38 +1555,344 @@ def verify_signature_menu(dss):
     print(f"Використовуються ключі користувача: {keys['name']}")
 
     # Введення шляху до файлу
+    file_path = input(
+        f"\nВведіть шлях до файлу для перевірки (Enter - усі документи з '{dss.bundle_file}'): "
+    ).strip()
+
+    if not file_path:
+        verify_bundle_report(dss, keys)
+        return
+
+    if not os.path.exists(file_path):
+        print(f"\nПомилка: Файл '{file_path}' не знайдено!")
+        return
+
+    try:
+        # Пошук підпису: окремий файл .sig або пакет підписів
+        signature_file = file_path + ".sig"
+        if os.path.exists(signature_file):
+            with open(signature_file, 'r') as f:
+                signature = f.read().strip()
+        else:
+            signature = dss.load_signature_from_bundle(file_path)
+            if signature is None:
+                print(f"\nПомилка: Підпис не знайдено ні у '{signature_file}', ні у '{dss.bundle_file}'!")
+                return
+
+        # Хеш обчислюється один раз (потоково) і використовується і для перевірки, і для звіту
+        algorithm, signature_hex = dss.parse_signature(signature)
+        doc_hash = dss.calculate_file_hash(file_path, algorithm=algorithm)
+
+        # Перевірка підпису
+        is_valid = dss._check_hash(doc_hash, signature_hex, keys['private_key'])
+
+        print("\n" + "=" * 70)
+        print("РЕЗУЛЬТАТ ПЕРЕВІРКИ")
+        print("=" * 70)
+        print(f"Файл документу: {file_path}")
+        print(f"Хеш документу ({algorithm}): {doc_hash}")
+        print(f"Цифровий підпис: {signature}")
+        print("-" * 70)
+
+        if is_valid:
+            print("СТАТУС: Підпис ДІЙСНИЙ")
+            print("Документ не змінювався після підписання")
+        else:
+            print("СТАТУС: Підпис ПІДРОБЛЕНИЙ")
+            print("Документ було змінено після підписання або підпис не відповідає!")
+
+        print("=" * 70)
+
+    except Exception as e:
+        print(f"\nПомилка при перевірці підпису: {e}")
+
+
+def sign_tree_menu(dss):
+    """Меню пакетного підписання каталогу"""
+    print("\n" + "-" * 70)
+    print("ПАКЕТНЕ ПІДПИСАННЯ КАТАЛОГУ")
+    print("-" * 70)
+
+    keys = dss.load_keys()
+    if not keys:
+        print("\nПомилка: Спочатку згенеруйте ключі (пункт 1)!")
+        return
+
+    print(f"Використовуються ключі користувача: {keys['name']}")
+
+    root_dir = input("\nВведіть шлях до каталогу: ").strip()
+
+    if not os.path.isdir(root_dir):
+        print(f"\nПомилка: Каталог '{root_dir}' не знайдено!")
+        return
+
+    try:
+        manifest_path = dss.sign_tree(root_dir, keys['private_key'])
+
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            count = len(json.load(f)["files"])
+
+        print("\nКаталог успішно підписано!")
+        print(f"Підписано файлів: {count}")
+        print(f"Маніфест збережено у файл: {manifest_path}")
+
+    except Exception as e:
+        print(f"\nПомилка при підписанні каталогу: {e}")
+
+
+def verify_tree_menu(dss):
+    """Меню пакетної перевірки каталогу"""
+    print("\n" + "-" * 70)
+    print("ПАКЕТНА ПЕРЕВІРКА КАТАЛОГУ")
+    print("-" * 70)
+
+    keys = dss.load_keys()
+    if not keys:
+        print("\nПомилка: Спочатку згенеруйте ключі (пункт 1)!")
+        return
+
+    print(f"Використовуються ключі користувача: {keys['name']}")
+
+    root_dir = input("\nВведіть шлях до каталогу: ").strip()
+
+    manifest_path = os.path.join(root_dir, dss.manifest_file)
+    if not os.path.exists(manifest_path):
+        print(f"\nПомилка: Маніфест '{manifest_path}' не знайдено!")
+        return
+
+    paranoid = False
+    use_cache = input("Використовувати кеш хешів 'hash_cache.db'? (y/n): ").strip()
+    if use_cache.lower() == 'y':
+        if dss.hash_cache is None:
+            dss.enable_hash_cache()
+        paranoid = input("Параноїдальний режим (перерахувати всі хеші)? (y/n): ").strip().lower() == 'y'
+
+    try:
+        checked, failures = dss.verify_tree(root_dir, keys['private_key'], paranoid=paranoid)
+
+        print("\n" + "=" * 70)
+        print("РЕЗУЛЬТАТ ПЕРЕВІРКИ")
+        print("=" * 70)
+        print(f"Перевірено файлів: {checked}")
+        print(f"Помилок: {len(failures)}")
+        print("-" * 70)
+
+        if failures:
+            for failure in failures:
+                print(f"  - {failure['path']}: {failure['reason']}")
+        else:
+            print("СТАТУС: Усі підписи ДІЙСНІ")
+
+        if dss.hash_cache is not None:
+            evicted = dss.hash_cache.evict_stale()
+            stats = dss.hash_cache.stats()
+            print("-" * 70)
+            print(f"Кеш хешів: влучань {stats['hits']}, промахів {stats['misses']}, "
+                  f"частка влучань {stats['hit_rate']:.1%}")
+            print(f"Записів у кеші: {stats['entries']}, видалено застарілих: {evicted}")
+
+        print("=" * 70)
+
+    except Exception as e:
+        print(f"\nПомилка при перевірці каталогу: {e}")
+
+
+def sign_merkle_menu(dss):
+    """Меню підписання великого файлу деревом Меркла"""
+    print("\n" + "-" * 70)
+    print("ПІДПИСАННЯ ВЕЛИКОГО ФАЙЛУ (ДЕРЕВО МЕРКЛА)")
+    print("-" * 70)
+
+    keys = dss.load_keys()
+    if not keys:
+        print("\nПомилка: Спочатку згенеруйте ключі (пункт 1)!")
+        return
+
+    print(f"Використовуються ключі користувача: {keys['name']}")
+
+    file_path = input("\nВведіть шлях до файлу для підписання: ").strip()
+
+    if not os.path.exists(file_path):
+        print(f"\nПомилка: Файл '{file_path}' не знайдено!")
+        return
+
+    try:
+        tree = dss.create_merkle_signature(file_path, keys['private_key'])
+        tree_file = dss.save_merkle_tree(file_path, tree)
+
+        print("\nФайл успішно підписано!")
+        print(f"Файл документу: {file_path}")
+        print(f"Фрагментів: {len(tree['levels'][0])} по {tree['chunk_size']} байт")
+        print(f"Корінь дерева (SHA256): {tree['root']}")
+        print(f"Цифровий підпис: {tree['signature']}")
+        print(f"Дерево збережено у файл: {tree_file}")
+
+    except Exception as e:
+        print(f"\nПомилка при підписанні документу: {e}")
+
+
+def verify_merkle_menu(dss):
+    """Меню перевірки великого файлу деревом Меркла"""
+    print("\n" + "-" * 70)
+    print("ПЕРЕВІРКА ВЕЛИКОГО ФАЙЛУ (ДЕРЕВО МЕРКЛА)")
+    print("-" * 70)
+
+    keys = dss.load_keys()
+    if not keys:
+        print("\nПомилка: Спочатку згенеруйте ключі (пункт 1)!")
+        return
+
+    print(f"Використовуються ключі користувача: {keys['name']}")
+
     file_path = input("\nВведіть шлях до файлу для перевірки: ").strip()
 
     if not os.path.exists(file_path):
         print(f"\nПомилка: Файл '{file_path}' не знайдено!")
         return
 
-    # Перевірка наявності файлу підпису
-    signature_file = file_path + ".sig"
+    tree = dss.load_merkle_tree(file_path)
+    if tree is None:
+        print(f"\nПомилка: Файл дерева '{file_path}.merkle' не знайдено!")
+        return
+
+    byte_range = input("Діапазон байтів 'початок:довжина' (Enter - весь файл): ").strip()
+
+    try:
+        print("\n" + "=" * 70)
+        print("РЕЗУЛЬТАТ ПЕРЕВІРКИ")
+        print("=" * 70)
+        print(f"Файл документу: {file_path}")
+        print(f"Корінь дерева (SHA256): {tree['root']}")
+        print("-" * 70)
+
+        if byte_range:
+            offset, length = (int(part) for part in byte_range.split(":"))
+            is_valid = dss.verify_merkle_range(file_path, tree, keys['private_key'], offset, length)
+            modified = []
+        else:
+            is_valid, modified = dss.verify_merkle_signature(file_path, tree, keys['private_key'])
+
+        if is_valid:
+            print("СТАТУС: Підпис ДІЙСНИЙ")
+            print("Документ не змінювався після підписання")
+        else:
+            print("СТАТУС: Підпис ПІДРОБЛЕНИЙ")
+            if modified:
+                print(f"Змінені фрагменти ({tree['chunk_size']} байт): "
+                      f"{', '.join(str(index) for index in modified)}")
+
+        print("=" * 70)
+
+    except Exception as e:
+        print(f"\nПомилка при перевірці підпису: {e}")
+
+
+def select_identity_menu(dss):
+    """Меню вибору підписувача"""
+    print("\n" + "-" * 70)
+    print("ВИБІР ПІДПИСУВАЧА")
+    print("-" * 70)
+
+    names = dss.list_identities()
+    if not names:
+        print("\nПомилка: Спочатку згенеруйте ключі (пункт 1)!")
+        return
+
+    current = dss.load_keys()
+    for i, name in enumerate(names, 1):
+        marker = " (активний)" if current and current['name'] == name else ""
+        print(f"{i}. {name}{marker}")
+
+    choice = input("\nВиберіть номер підписувача: ").strip()
+
+    if not choice.isdigit() or not 1 <= int(choice) <= len(names):
+        print("\nПомилка: Невірний номер!")
+        return
+
+    name = names[int(choice) - 1]
+    dss.select_identity(name)
+    print(f"\nАктивний підписувач: {name}")
+
+
+def sign_schnorr_menu(dss):
+    """Меню підписання документу схемою Шнорра"""
+    print("\n" + "-" * 70)
+    print("ПІДПИСАННЯ ДОКУМЕНТУ (ШНОРР)")
+    print("-" * 70)
+
+    keys = dss.load_keys()
+    if not keys:
+        print("\nПомилка: Спочатку згенеруйте ключі (пункт 1)!")
+        return
+
+    print(f"Використовуються ключі користувача: {keys['name']}")
+
+    file_path = input("\nВведіть шлях до файлу для підписання: ").strip()
+
+    if not os.path.exists(file_path):
+        print(f"\nПомилка: Файл '{file_path}' не знайдено!")
+        return
+
+    try:
+        with open(file_path, 'rb') as f:
+            document_content = f.read()
+
+        secret, public_key = dss.schnorr_keys(keys)
+        signature = dss.schnorr.sign(document_content, secret)
+
+        signature_file = file_path + ".schnorr"
+        with open(signature_file, 'w') as f:
+            f.write(signature)
+
+        print("\nДокумент успішно підписано!")
+        print(f"Файл документу: {file_path}")
+        print(f"Цифровий підпис: {signature}")
+        print(f"Публічний ключ для перевірки: {public_key}")
+        print(f"Підпис збережено у файл: {signature_file}")
+
+    except Exception as e:
+        print(f"\nПомилка при підписанні документу: {e}")
+
+
+def verify_schnorr_menu(dss):
+    """Меню перевірки підпису Шнорра за публічним ключем"""
+    print("\n" + "-" * 70)
+    print("ПЕРЕВІРКА ПІДПИСУ (ШНОРР)")
+    print("-" * 70)
+
+    file_path = input("Введіть шлях до файлу для перевірки: ").strip()
+
+    if not os.path.exists(file_path):
+        print(f"\nПомилка: Файл '{file_path}' не знайдено!")
+        return
+
+    signature_file = file_path + ".schnorr"
     if not os.path.exists(signature_file):
         print(f"\nПомилка: Файл підпису '{signature_file}' не знайдено!")
         return
 
+    public_key = input("Введіть публічний ключ Шнорра (Enter - активний підписувач): ").strip()
+    if not public_key:
+        keys = dss.load_keys()
+        if not keys:
+            print("\nПомилка: Немає активного підписувача, введіть публічний ключ!")
+            return
+        public_key = dss.schnorr_keys(keys)[1]
+
     try:
-        # Читання файлу
         with open(file_path, 'rb') as f:
             document_content = f.read()
 
-        # Читання підпису
         with open(signature_file, 'r') as f:
             signature = f.read().strip()
 
-        # Перевірка підпису
-        is_valid = dss.verify_signature(document_content, signature, keys['private_key'])
-
-        # Обчислення хешу
-        doc_hash = dss.calculate_document_hash(document_content)
+        is_valid = dss.schnorr.verify(document_content, signature, public_key)
 
         print("\n" + "=" * 70)
         print("РЕЗУЛЬТАТ ПЕРЕВІРКИ")
         print("=" * 70)
         print(f"Файл документу: {file_path}")
-        print(f"Хеш документу (SHA256): {doc_hash}")
+        print(f"Публічний ключ: {public_key}")
         print(f"Цифровий підпис: {signature}")
         print("-" * 70)
 
@@ -273,7 +1915,7 @@ def main():
 
     while True:
         show_menu()
-        choice = input("\nВиберіть дію (1-4): ").strip()
+        choice = input("\nВиберіть дію (1-11): ").strip()
 
         if choice == "1":
             generate_key_menu(dss)
@@ -282,10 +1924,24 @@ def main():
         elif choice == "3":
             verify_signature_menu(dss)
         elif choice == "4":
+            sign_tree_menu(dss)
+        elif choice == "5":
+            verify_tree_menu(dss)
+        elif choice == "6":
+            sign_merkle_menu(dss)
+        elif choice == "7":
+            verify_merkle_menu(dss)
+        elif choice == "8":
+            select_identity_menu(dss)
+        elif choice == "9":
+            sign_schnorr_menu(dss)
+        elif choice == "10":
+            verify_schnorr_menu(dss)
+        elif choice == "11":
             print("\nЗавершення роботи програми...")
             break
         else:
-            print("\nПомилка: Невірний вибір! Виберіть пункт від 1 до 4.")
+            print("\nПомилка: Невірний вибір! Виберіть пункт від 1 до 11.")
 
     print("Дякуємо за використання системи цифрових підписів!")
 
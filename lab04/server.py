@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Каталог лабораторної (модуль lab4) і корінь репозиторію (спільний модуль metrics)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab4 import DigitalSignatureSystem
+from metrics import REGISTRY, SnapshotWriter
+
+
+# Найбільша довжина рядка запиту (дані "data" у base64 передаються в одному рядку)
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+# Метрики сервісу у спільному реєстрі процесу: затримка та обсяг даних кожної операції
+OPERATION_METRICS = {
+    op: (REGISTRY.timer(f"lab04.server.{op}.latency", f"Затримка запитів {op}"),
+         REGISTRY.bytes_counter(f"lab04.server.{op}.processed", f"Оброблені дані запитів {op}"))
+    for op in ("sign", "verify")
+}
+COALESCED = REGISTRY.counter("lab04.server.coalesced", "Об'єднані запити хешування того самого файлу")
+
+
+class SigningServer:
+    """
+    Локальний asyncio-сервіс підписів на основі DigitalSignatureSystem.
+
+    Протокол: один JSON-запит на рядок, одна JSON-відповідь на рядок.
+        {"op": "sign", "path": "doc.pdf"}                          - підписати файл
+        {"op": "sign", "data": "<base64>"}                         - підписати байти
+        {"op": "verify", "path": "doc.pdf", "signature": "v1:..."} - перевірити підпис
+        {"op": "metrics"}                                          - метрики сервісу
+    Необов'язкові поля: "name" (підписувач), "algorithm" (хеш-алгоритм),
+    "id" (повертається у відповіді; відповіді можуть надходити не в порядку запитів).
+    """
+
+    def __init__(self, dss=None, workers=None):
+        self.dss = dss or DigitalSignatureSystem()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = {}
+        self._server = None
+
+    def _record(self, op, seconds, size):
+        """Облік затримки та обсягу даних для операції (у спільному REGISTRY)"""
+        latency, processed = OPERATION_METRICS[op]
+        latency.observe(seconds)
+        processed.inc(size)
+
+    def metrics_snapshot(self):
+        """Метрики: кількість, середня затримка та байт/с для кожної операції"""
+        snapshot = {"coalesced": COALESCED.value}
+        for op, (latency, processed) in OPERATION_METRICS.items():
+            if latency.count:
+                snapshot[op] = {
+                    "count": latency.count,
+                    "avg_latency_ms": latency.total / latency.count * 1000,
+                    "bytes_per_second": processed.value / latency.total if latency.total else 0.0
+                }
+        return snapshot
+
+    async def _hash_file(self, path, algorithm):
+        """
+        Хешування файлу у пулі потоків.
+        Одночасні запити для того самого файлу (шлях, mtime, розмір) об'єднуються в одне завдання.
+        """
+        stat_result = os.stat(path)
+        key = (os.path.abspath(path), stat_result.st_mtime_ns, stat_result.st_size, algorithm)
+
+        future = self._pending.get(key)
+        if future is not None:
+            COALESCED.inc()
+            return await future, stat_result.st_size
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self.dss.calculate_file_hash, path, False, algorithm)
+        self._pending[key] = future
+        try:
+            return await future, stat_result.st_size
+        finally:
+            self._pending.pop(key, None)
+
+    async def _hash_request(self, request, algorithm):
+        """Хеш документу із запиту: файл або байти (base64)"""
+        if "path" in request:
+            return await self._hash_file(request["path"], algorithm)
+
+        data = base64.b64decode(request["data"])
+        loop = asyncio.get_running_loop()
+        doc_hash = await loop.run_in_executor(
+            self.executor, self.dss.calculate_document_hash, data, algorithm
+        )
+        return doc_hash, len(data)
+
+    async def handle_request(self, request):
+        """
+        Обробка одного запиту
+
+        Returns:
+            dict: відповідь ("ok": True/False)
+        """
+        op = request.get("op")
+        if op == "metrics":
+            return {"ok": True, "metrics": self.metrics_snapshot()}
+        if op not in ("sign", "verify"):
+            return {"ok": False, "error": f"Невідома операція: {op}"}
+
+        keys = self.dss.load_keys(request.get("name"))
+        if not keys:
+            return {"ok": False, "error": "Ключі підписувача не знайдено"}
+
+        start = time.perf_counter()
+        if op == "sign":
+            algorithm = request.get("algorithm") or self.dss.hash_algorithm
+            doc_hash, size = await self._hash_request(request, algorithm)
+            signature = self.dss._sign_hash(doc_hash, keys['private_key'], algorithm)
+            response = {"ok": True, "name": keys['name'], "hash": doc_hash, "signature": signature}
+        else:
+            algorithm, signature_hex = self.dss.parse_signature(request["signature"])
+            doc_hash, size = await self._hash_request(request, algorithm)
+            is_valid = self.dss._check_hash(doc_hash, signature_hex, keys['private_key'])
+            response = {"ok": True, "name": keys['name'], "valid": is_valid}
+
+        self._record(op, time.perf_counter() - start, size)
+        return response
+
+    async def _handle_client(self, reader, writer):
+        """Обслуговування одного з'єднання (запити обробляються паралельно)"""
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            request = {}
+            try:
+                request = json.loads(line)
+                response = await self.handle_request(request)
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            if isinstance(request, dict) and "id" in request:
+                response["id"] = request["id"]
+            async with write_lock:
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # Рядок довший за ліміт: решта з'єднання вже не розбирається по рядках
+                    async with write_lock:
+                        writer.write(json.dumps(
+                            {"ok": False, "error": f"Запит перевищує {MAX_REQUEST_SIZE} байт"},
+                            ensure_ascii=False
+                        ).encode('utf-8') + b"\n")
+                        await writer.drain()
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Запуск сервера; повертає фактичну адресу (host, port)"""
+        self._server = await asyncio.start_server(self._handle_client, host, port, limit=MAX_REQUEST_SIZE)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Обслуговування запитів до зупинки"""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        """Зупинка сервера та пулу потоків"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+
+async def run(host, port):
+    """Запуск сервісу підписів до переривання"""
+    server = SigningServer()
+    address = await server.start(host, port)
+    print(f"Сервіс підписів слухає {address[0]}:{address[1]}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main():
+    """Головна функція сервісу"""
+    parser = argparse.ArgumentParser(description="Сервіс цифрових підписів (lab4)")
+    parser.add_argument("--host", default="127.0.0.1", help="адреса для прослуховування")
+    parser.add_argument("--port", type=int, default=8765, help="порт")
+    parser.add_argument("--metrics-file", help="файл для знімків метрик (операції/с, затримка)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json",
+                        help="формат знімка метрик")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="період запису знімка (секунди)")
+    args = parser.parse_args()
+
+    writer = None
+    if args.metrics_file:
+        writer = SnapshotWriter(args.metrics_file, args.metrics_format, args.metrics_interval).start()
+
+    try:
+        asyncio.run(run(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nЗавершення роботи сервісу...")
+    finally:
+        if writer is not None:
+            writer.stop()
+
+
+if __name__ == "__main__":
+    main()
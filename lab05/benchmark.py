@@ -0,0 +1,289 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Каталог лабораторної (модуль lab5) і корінь репозиторію (спільні модулі benchmark_common, metrics)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lab5
+from lab5 import EmailSymmetricSystem, COMPRESSION_IDS
+from benchmark_common import add_baseline_arguments, format_size, save_or_compare
+
+
+DEFAULT_SIZES = [100 * 1024, 1024 * 1024, 16 * 1024 * 1024]
+# Від 100 Б до 1 ГБ; 1 ГБ потребує кількох ГБ пам'яті, тому вмикається явно через --sizes
+MESSAGE_SIZES = [100, 10 * 1024, 1024 * 1024, 100 * 1024 * 1024]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+SAMPLE_TEXT = (
+    "Шановний колего! Надсилаю звіт з лабораторної роботи щодо симетричного шифрування. "
+    "Dear colleague, please find attached the quarterly report on message encryption. "
+)
+ASCII_TEXT = "Dear colleague, please find attached the quarterly report on message encryption. "
+CYRILLIC_TEXT = "Шановний колего! Надсилаю звіт з лабораторної роботи щодо симетричного шифрування. "
+
+
+def make_text(size):
+    """Текст листа потрібного розміру (байти UTF-8)"""
+    data = SAMPLE_TEXT.encode('utf-8')
+    return (data * (size // len(data) + 1))[:size]
+
+
+def make_message(text, size):
+    """Рядок, що в UTF-8 займає не більше size байтів (без розірваних символів)"""
+    data = (text * (size // len(text.encode('utf-8')) + 1)).encode('utf-8')[:size]
+    return data.decode('utf-8', errors='ignore')
+
+
+def timings(func, repeat):
+    """Час кожного з repeat запусків (секунди) та результат останнього"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def peak_memory(func):
+    """Пікове виділення пам'яті під час одного запуску (байти)"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(samples, size=None, measure_memory=None):
+    """Пропускна здатність, перцентилі затримки та пікова пам'ять"""
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    if len(samples_ms) > 1:
+        percentiles = statistics.quantiles(samples_ms, n=100, method='inclusive')
+        p50, p90, p99 = percentiles[49], percentiles[89], percentiles[98]
+    else:
+        p50 = p90 = p99 = samples_ms[0]
+
+    summary = {"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "ops_s": 1000 / samples_ms[0]}
+    if size is not None:
+        summary["mb_s"] = size / (samples_ms[0] / 1000) / (1024 * 1024)
+    if measure_memory is not None:
+        summary["peak_mb"] = peak_memory(measure_memory) / (1024 * 1024)
+    return summary
+
+
+def benchmark_messages(sizes, repeat, key_bytes, measure_memory):
+    """
+    encrypt_message / decrypt_message для str і bytes, ASCII і кирилиці.
+    Кожен запуск перевіряє, що розшифрований текст збігається з початковим.
+
+    Returns:
+        dict: {"тип/текст/розмір": {"encrypt": зведення, "decrypt": зведення}}
+    """
+    system = EmailSymmetricSystem()
+    results = {}
+
+    for size in sizes:
+        for text_name, text in (("ascii", ASCII_TEXT), ("cyrillic", CYRILLIC_TEXT)):
+            message = make_message(text, size)
+            for input_type in ("str", "bytes"):
+                payload = message if input_type == "str" else message.encode('utf-8')
+                byte_size = len(message.encode('utf-8'))
+                case_repeat = max(1, min(repeat, repeat * 1024 * 1024 // max(byte_size, 1)))
+
+                encrypt_samples, encrypted = timings(
+                    lambda: system.encrypt_message(payload, key_bytes), case_repeat
+                )
+                decrypt_samples, decrypted = timings(
+                    lambda: system.decrypt_message(encrypted, key_bytes), case_repeat
+                )
+                if decrypted != message:
+                    raise RuntimeError(f"Бенчмарк: невдалий цикл шифрування ({input_type}/{text_name}/{size})")
+
+                results[f"{input_type}/{text_name}/{size}"] = {
+                    "encrypt": summarize(
+                        encrypt_samples, byte_size,
+                        (lambda: system.encrypt_message(payload, key_bytes)) if measure_memory else None
+                    ),
+                    "decrypt": summarize(
+                        decrypt_samples, byte_size,
+                        (lambda: system.decrypt_message(encrypted, key_bytes)) if measure_memory else None
+                    )
+                }
+
+    return results
+
+
+def benchmark_keys(repeat):
+    """
+    generate_key та load_key: холодний (без кешу) і теплий (з кешем) виклик
+
+    Returns:
+        dict: {"операція/стан": зведення}
+    """
+    results = {}
+
+    def generate_cold():
+        lab5._derive_key.cache_clear()
+        return EmailSymmetricSystem().generate_key("benchmark@example.com", "2000")
+
+    warm_system = EmailSymmetricSystem()
+    warm_system.generate_key("benchmark@example.com", "2000")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        keys_file = os.path.join(work_dir, "symmetric_key.json")
+        writer = EmailSymmetricSystem()
+        writer.keys_file = keys_file
+        writer.keyring.keyring_file = os.path.join(work_dir, "keyring.json")
+        writer.save_key("benchmark@example.com", generate_cold()[1])
+
+        def load_cold():
+            system = EmailSymmetricSystem()
+            system.keys_file = keys_file
+            return system.load_key()
+
+        warm_reader = EmailSymmetricSystem()
+        warm_reader.keys_file = keys_file
+        warm_reader.load_key()
+
+        cases = {
+            "generate_key/cold": generate_cold,
+            "generate_key/warm": lambda: warm_system.generate_key("benchmark@example.com", "2000"),
+            "load_key/cold": load_cold,
+            "load_key/warm": warm_reader.load_key,
+        }
+        for name, func in cases.items():
+            samples, _ = timings(func, repeat * 100)
+            results[name] = summarize(samples)
+
+    return results
+
+
+def print_messages_report(results):
+    """Виведення таблиці для encrypt_message / decrypt_message"""
+    print("\n" + "=" * 90)
+    print("ШИФРУВАННЯ ПОВІДОМЛЕНЬ")
+    print("=" * 90)
+    print(f"{'Випадок':<28}{'Операція':<10}{'МБ/с':>10}{'p50, мс':>11}{'p90, мс':>11}"
+          f"{'p99, мс':>11}{'Пам., МБ':>9}")
+    print("-" * 90)
+    for case, operations in results.items():
+        input_type, text_name, size = case.split("/")
+        label = f"{input_type}/{text_name}/{format_size(int(size))}"
+        for op, summary in operations.items():
+            peak = f"{summary['peak_mb']:.1f}" if "peak_mb" in summary else "-"
+            print(f"{label:<28}{op:<10}{summary['mb_s']:>10.1f}{summary['p50_ms']:>11.3f}"
+                  f"{summary['p90_ms']:>11.3f}{summary['p99_ms']:>11.3f}{peak:>9}")
+    print("=" * 90)
+
+
+def print_keys_report(results):
+    """Виведення таблиці для generate_key / load_key"""
+    print("\n" + "=" * 70)
+    print("КЛЮЧІ")
+    print("=" * 70)
+    print(f"{'Операція':<24}{'оп/с':>12}{'p50, мкс':>11}{'p90, мкс':>11}{'p99, мкс':>11}")
+    print("-" * 70)
+    for name, summary in results.items():
+        print(f"{name:<24}{summary['ops_s']:>12.0f}{summary['p50_ms'] * 1000:>11.1f}"
+              f"{summary['p90_ms'] * 1000:>11.1f}{summary['p99_ms'] * 1000:>11.1f}")
+    print("=" * 70)
+
+
+def flatten_results(message_results, key_results):
+    """Плоский словник метрик {"назва": значення} (більше - краще) для базової лінії"""
+    flat = {}
+    for case, operations in (message_results or {}).items():
+        for op, summary in operations.items():
+            flat[f"message/{case}/{op}/mb_s"] = summary["mb_s"]
+    for name, summary in (key_results or {}).items():
+        flat[f"key/{name}/ops_s"] = summary["ops_s"]
+    return flat
+
+
+def benchmark_compression(sizes, key_bytes):
+    """
+    Порівняння стиснення перед шифруванням із нестисненим шляхом
+
+    Returns:
+        list: рядки (розмір, формат, стиснення, байт_записано, секунд_шифрування+розшифрування)
+    """
+    system = EmailSymmetricSystem()
+    rows = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "message.txt")
+        encrypted = os.path.join(work_dir, "message.enc")
+        decrypted = os.path.join(work_dir, "message.dec")
+
+        for size in sizes:
+            with open(source, 'wb') as f:
+                f.write(make_text(size))
+
+            for file_format, encrypt, decrypt in (
+                ("base64", system.encrypt_file, system.decrypt_file),
+                ("raw", system.encrypt_file_raw, system.decrypt_file_raw),
+            ):
+                for compression in [None] + list(COMPRESSION_IDS):
+                    start = time.perf_counter()
+                    encrypt(source, encrypted, key_bytes, compression)
+                    if not decrypt(encrypted, decrypted, key_bytes):
+                        raise RuntimeError("Бенчмарк: розшифрування не вдалося")
+                    seconds = time.perf_counter() - start
+                    rows.append((size, file_format, compression or "-", os.path.getsize(encrypted), seconds))
+
+    return rows
+
+
+def print_compression_report(rows):
+    """Виведення таблиці: записані байти та повний час шифрування+розшифрування"""
+    print("\n" + "=" * 70)
+    print("СТИСНЕННЯ ПЕРЕД ШИФРУВАННЯМ")
+    print("=" * 70)
+    print(f"{'Розмір':<12}{'Формат':<10}{'Стиснення':<12}{'Записано':>14}{'Час, с':>12}")
+    print("-" * 70)
+    for size, file_format, compression, written, seconds in rows:
+        print(f"{format_size(size):<12}{file_format:<10}{compression:<12}"
+              f"{format_size(written):>14}{seconds:>12.3f}")
+    print("=" * 70)
+
+
+def main():
+    """Головна функція бенчмарку"""
+    parser = argparse.ArgumentParser(description="Бенчмарк симетричного шифрування листів (lab5)")
+    parser.add_argument("--suite", nargs="+", choices=["messages", "keys", "compression"],
+                        default=["messages", "keys"], help="набори вимірювань")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help="розміри повідомлень у байтах (за замовчуванням залежать від набору)")
+    parser.add_argument("--repeat", type=int, default=20, help="кількість повторів вимірювання")
+    parser.add_argument("--memory", action="store_true", help="пікова пам'ять через tracemalloc")
+    add_baseline_arguments(parser, DEFAULT_BASELINE)
+    args = parser.parse_args()
+
+    key_bytes, _ = EmailSymmetricSystem().generate_key("benchmark@example.com", "2000")
+    message_results = key_results = None
+
+    if "messages" in args.suite:
+        message_results = benchmark_messages(args.sizes or MESSAGE_SIZES, args.repeat, key_bytes, args.memory)
+        print_messages_report(message_results)
+    if "keys" in args.suite:
+        key_results = benchmark_keys(args.repeat)
+        print_keys_report(key_results)
+    if "compression" in args.suite:
+        print_compression_report(benchmark_compression(args.sizes or DEFAULT_SIZES, key_bytes))
+
+    flat = flatten_results(message_results, key_results)
+    if not flat:
+        return
+
+    save_or_compare(flat, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,74 +2,867 @@ import hashlib
 import os
 import json
 import base64
+import bz2
+import collections
+import email
+import hmac
+import itertools
+import lzma
+import mailbox
+import math
+import mmap
+import secrets
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import instrument
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Алгоритми стиснення: назва -> ідентифікатор у заголовку
+COMPRESSION_IDS = {"zlib": 1, "lzma": 2, "bz2": 3}
+
+DECOMPRESSION_ERRORS = (ValueError, OSError, EOFError, zlib.error, lzma.LZMAError)
+
+# Автентифікація: HMAC-SHA256 над шифротекстом, тег дописується в кінець
+MAC_SIZE = 32
+
+# Розмір блоку XOR без NumPy: ціле число такого розміру ще вміщується у кеш процесора
+XOR_BLOCK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=64)
+def _key_block(key_bytes, length):
+    """Ключ, повторений до length байтів, як ціле число (запам'ятовується для повторних блоків)"""
+    repeats = -(-length // len(key_bytes))
+    return int.from_bytes((key_bytes * repeats)[:length], 'big')
+
+
+@lru_cache(maxsize=1024)
+def _derive_key(email, birthdate):
+    """Запам'ятовуване отримання ключа: SHA256(email + дата)"""
+    return hashlib.sha256((email + birthdate).encode('utf-8')).digest()
+
+
+def _file_stamp(path_or_stat):
+    """Відбиток файлу (mtime_ns, розмір) для інвалідації кешу"""
+    stat_result = os.stat(path_or_stat) if isinstance(path_or_stat, str) else path_or_stat
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def _process_mail_chunk(mode, key_bytes, raw_messages):
+    """
+    Обробка частини листів у процесі пулу.
+
+    Returns:
+        list: байти вихідного листа або None, якщо розшифрування не вдалося
+    """
+    system = EmailSymmetricSystem()
+    if mode == "encrypt":
+        return [system.encrypt_mail(raw, key_bytes) for raw in raw_messages]
+    return [system.decrypt_mail(raw, key_bytes) for raw in raw_messages]
+
+
+class KeyRing:
+    """
+    Зв'язка ключів багатьох отримувачів (JSON: {email: ключ_hex}).
+    Файл читається лише тоді, коли змінилися його mtime або розмір.
+    """
+
+    def __init__(self, keyring_file="keyring.json"):
+        self.keyring_file = keyring_file
+        self._keys = {}
+        self._stamp = None
+
+    def _refresh(self):
+        """Перечитування файлу лише після його зміни"""
+        try:
+            stat_result = os.stat(self.keyring_file)
+        except FileNotFoundError:
+            self._keys, self._stamp = {}, None
+            return
+
+        stamp = _file_stamp(stat_result)
+        if stamp != self._stamp:
+            with open(self.keyring_file, 'r', encoding='utf-8') as f:
+                self._keys = {email: bytes.fromhex(key_hex) for email, key_hex in json.load(f).items()}
+            self._stamp = stamp
+
+    def add(self, email, key_hex):
+        """Додавання або оновлення ключа отримувача"""
+        self._refresh()
+        data = {address: key.hex() for address, key in self._keys.items()}
+        data[email] = key_hex
+
+        temp_file = self.keyring_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(temp_file, self.keyring_file)
+        # Кеш оновлюється напряму: при грубому mtime заміна ключа тієї ж довжини
+        # не змінює відбиток файлу; він потрібен лише для змін інших процесів
+        self._keys = {address: bytes.fromhex(key) for address, key in data.items()}
+        self._stamp = _file_stamp(self.keyring_file)
+
+    def get(self, email):
+        """Ключ отримувача (bytes) або None"""
+        self._refresh()
+        return self._keys.get(email)
+
+    def emails(self):
+        """Список адрес у зв'язці"""
+        self._refresh()
+        return sorted(self._keys)
+
 
 class EmailSymmetricSystem:
     """Система симетричного шифрування електронних повідомлень"""
 
+    # Текстовий формат зі стисненням або тегом: префікс версії + Base64(байт прапорців +
+    # зашифровані дані + тег). Без них шифротекст - просто Base64(XOR), як і раніше.
+    # Символу ':' немає в алфавіті Base64, тож обидва формати розпізнаються однозначно.
+    MESSAGE_PREFIX = "v2:"
+
+    # Прапорці (спільні для тексту і контейнера): молодші біти - ідентифікатор стиснення
+    FLAG_AUTHENTICATED = 0x80
+
+    # Двійковий контейнер: магічне слово, версія, прапорці, довжина даних
+    RAW_MAGIC = b"XENC"
+    RAW_VERSION = 1
+    RAW_HEADER = struct.Struct(">4sBBQ")
+
     def __init__(self):
         self.keys_file = "symmetric_key.json"
+        self.stream_chunk_size = 1024 * 1024
+        self.keyring = KeyRing()
+        self._key_cache = None
+        self._key_stamp = None
 
+    @instrument("lab05.generate_key")
     def generate_key(self, email, birthdate):
         """
         Генерація симетричного ключа на основі Email та дати.
         Секретне слово прибрано.
         """
-        # Формуємо рядок даних
-        data = email + birthdate
-
-        # Генеруємо хеш (SHA256)
-        key_hash_bytes = hashlib.sha256(data.encode('utf-8')).digest()
+        # Генеруємо хеш (SHA256) від email + дата; результат запам'ятовується
+        key_hash_bytes = _derive_key(email, birthdate)
         key_hex = key_hash_bytes.hex()
 
         return key_hash_bytes, key_hex
 
     def save_key(self, email, key_hex):
-        """Збереження ключа у файл"""
+        """Збереження ключа у файл (і у зв'язку ключів)"""
         key_data = {
             "email": email,
             "secret_key": key_hex
         }
         with open(self.keys_file, 'w', encoding='utf-8') as f:
             json.dump(key_data, f, ensure_ascii=False, indent=4)
+        self._key_cache = bytes.fromhex(key_hex), email
+        self._key_stamp = _file_stamp(self.keys_file)
+        self.keyring.add(email, key_hex)
 
+    @instrument("lab05.load_key")
     def load_key(self):
-        """Завантаження ключа з файлу"""
-        if not os.path.exists(self.keys_file):
+        """Завантаження ключа з файлу (перечитується лише після зміни файлу)"""
+        try:
+            stat_result = os.stat(self.keys_file)
+        except FileNotFoundError:
             return None
 
-        with open(self.keys_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return bytes.fromhex(data['secret_key']), data['email']
+        stamp = _file_stamp(stat_result)
+        if stamp != self._key_stamp:
+            with open(self.keys_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._key_cache = bytes.fromhex(data['secret_key']), data['email']
+            self._key_stamp = stamp
+        return self._key_cache
+
+    @instrument("lab05.encrypt_for_recipients", size_arg=1)
+    def encrypt_for_recipients(self, message, recipients, compression=None, authenticate=False):
+        """
+        Шифрування для кількох отримувачів: тіло шифрується один раз випадковим
+        сеансовим ключем, а для кожного отримувача шифрується лише цей ключ.
+        Вартість O(повідомлення + N) замість O(повідомлення * N).
+        Сеансовий ключ обгортається не довготривалим ключем отримувача, а ключем
+        HMAC-SHA256(ключ_отримувача, випадковий nonce): отримувач, який дізнався
+        сеансовий ключ, не може відновити з конверта ключі інших отримувачів.
+
+        Args:
+            message: текст або байти
+            recipients: список email з зв'язки ключів
+            compression: стиснення тіла (як у encrypt_message)
+            authenticate: True - тег HMAC для тіла та кожного обгорнутого ключа
+
+        Returns:
+            str: конверт (JSON) з обгорнутими ключами та тілом
+        """
+        session_key = secrets.token_bytes(32)
+        wrapped_keys = {}
+        for recipient in recipients:
+            recipient_key = self.keyring.get(recipient)
+            if recipient_key is None:
+                raise KeyError(f"Немає ключа для отримувача: {recipient}")
+            nonce = secrets.token_bytes(16)
+            wrapped_keys[recipient] = {
+                "nonce": nonce.hex(),
+                "key": self.encrypt_message(session_key, self._wrapping_key(recipient_key, nonce),
+                                            authenticate=authenticate)
+            }
+
+        return json.dumps({
+            "version": 2,
+            "recipients": wrapped_keys,
+            "body": self.encrypt_message(message, session_key, compression, authenticate)
+        }, ensure_ascii=False)
+
+    @instrument("lab05.decrypt_for_recipient", size_arg=1)
+    def decrypt_for_recipient(self, envelope, email, key_bytes, authenticate=False):
+        """
+        Розшифрування конверта, створеного encrypt_for_recipients
+
+        authenticate: True - вимагати теги HMAC (як у decrypt_message)
+
+        Returns:
+            str: текст повідомлення або None
+        """
+        try:
+            data = json.loads(envelope)
+            wrapped = data["recipients"][email]
+            if isinstance(wrapped, str):
+                # Конверт версії 1: сеансовий ключ обгорнуто безпосередньо ключем отримувача
+                session_key = self.decrypt_bytes(wrapped, key_bytes, authenticate)
+            else:
+                wrapping_key = self._wrapping_key(key_bytes, bytes.fromhex(wrapped["nonce"]))
+                session_key = self.decrypt_bytes(wrapped["key"], wrapping_key, authenticate)
+            if session_key is None:
+                return None
+            return self.decrypt_message(data["body"], session_key, authenticate)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _wrapping_key(recipient_key, nonce):
+        """Ключ обгортання для одного отримувача й одного конверта: HMAC-SHA256(ключ, nonce)"""
+        return hmac.new(recipient_key, nonce, hashlib.sha256).digest()
+
+    def is_envelope(self, ciphertext):
+        """Чи є шифротекст конвертом для кількох отримувачів"""
+        return ciphertext.lstrip().startswith("{")
+
+    @instrument("lab05.xor", size_arg=1)
+    def xor_bytes(self, data, key_bytes, offset=0):
+        """
+        XOR усього буфера з ключем за один прохід (без циклу по байтах).
+        Ключ повторюється до довжини даних; offset - позиція першого байта
+        у повідомленні (для обробки частинами).
+        Використовує NumPy, якщо він встановлений, інакше XOR великих цілих чисел
+        блоками по XOR_BLOCK_SIZE із запам'ятованим ключем блоку.
+        """
+        length = len(data)
+        if length == 0:
+            return b""
+
+        key_len = len(key_bytes)
+        shift = offset % key_len
+        rotated_key = key_bytes[shift:] + key_bytes[:shift]
+
+        if np is not None:
+            data_array = np.frombuffer(data, dtype=np.uint8)
+            key_array = np.resize(np.frombuffer(rotated_key, dtype=np.uint8), length)
+            return np.bitwise_xor(data_array, key_array).tobytes()
+
+        # Розмір блоку кратний довжині ключа, тож кожен блок XOR-иться тим самим числом
+        block = key_len * max(1, XOR_BLOCK_SIZE // key_len)
+        whole = length - length % block
+        view = memoryview(data)
+        from_bytes = int.from_bytes
+        key_int = _key_block(rotated_key, block)
+        parts = [(from_bytes(view[i:i + block], 'big') ^ key_int).to_bytes(block, 'big')
+                 for i in range(0, whole, block)]
+        if whole < length:
+            tail = length - whole
+            parts.append((from_bytes(view[whole:], 'big') ^ _key_block(rotated_key, tail)).to_bytes(tail, 'big'))
+        return b"".join(parts)
+
+    def _compressor(self, compression):
+        """Потоковий компресор за назвою алгоритму"""
+        if compression == "zlib":
+            return zlib.compressobj(6)
+        if compression == "lzma":
+            return lzma.LZMACompressor()
+        if compression == "bz2":
+            return bz2.BZ2Compressor()
+        raise ValueError(f"Невідомий алгоритм стиснення: {compression}")
+
+    def _decompressor(self, compression_id):
+        """Потоковий декомпресор за ідентифікатором із заголовка"""
+        if compression_id == COMPRESSION_IDS["zlib"]:
+            return zlib.decompressobj()
+        if compression_id == COMPRESSION_IDS["lzma"]:
+            return lzma.LZMADecompressor()
+        if compression_id == COMPRESSION_IDS["bz2"]:
+            return bz2.BZ2Decompressor()
+        raise ValueError(f"Невідомий ідентифікатор стиснення: {compression_id}")
+
+    def _compressed_chunks(self, chunks, compression):
+        """Стиснення потоку частин (без стиснення частини передаються як є)"""
+        if compression is None:
+            yield from chunks
+            return
+
+        compressor = self._compressor(compression)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def _decompressed_chunks(self, chunks, compression_id):
+        """Розпакування потоку частин за ідентифікатором із прапорців (0 - без стиснення)"""
+        if not compression_id:
+            yield from chunks
+            return
+
+        decompressor = self._decompressor(compression_id)
+        for chunk in chunks:
+            yield decompressor.decompress(chunk)
+        if not decompressor.eof:
+            raise ValueError("Неповні стиснені дані")
+
+    def _flags(self, compression, authenticate):
+        """Байт прапорців: ідентифікатор стиснення та FLAG_AUTHENTICATED"""
+        flags = COMPRESSION_IDS[compression] if compression else 0
+        if authenticate:
+            flags |= self.FLAG_AUTHENTICATED
+        return flags
+
+    def _parse_flags(self, flags):
+        """
+        Розбір байта прапорців
+
+        Returns:
+            tuple: (ідентифікатор_стиснення, чи_є_тег)
+        """
+        compression_id = flags & ~self.FLAG_AUTHENTICATED
+        if compression_id and compression_id not in COMPRESSION_IDS.values():
+            raise ValueError(f"Невідомий ідентифікатор стиснення: {compression_id}")
+        return compression_id, bool(flags & self.FLAG_AUTHENTICATED)
+
+    def _mac(self, key_bytes):
+        """HMAC-SHA256 з окремим ключем, отриманим із ключа шифрування"""
+        return hmac.new(hashlib.sha256(b"lab5-hmac" + key_bytes).digest(), digestmod=hashlib.sha256)
+
+    def _tagged_chunks(self, chunks, mac):
+        """Обчислення HMAC у тому ж проході, що й шифрування; тег - останньою частиною"""
+        for chunk in chunks:
+            mac.update(chunk)
+            yield chunk
+        yield mac.digest()
+
+    def _untagged_chunks(self, chunks, mac, tag_holder):
+        """
+        Відокремлення тегу (останні MAC_SIZE байтів) з одночасним обчисленням HMAC.
+        Знайдений тег додається у tag_holder після завершення потоку.
+        """
+        tail = b""
+        for chunk in chunks:
+            data = tail + chunk
+            release, tail = data[:-MAC_SIZE], data[-MAC_SIZE:]
+            if release:
+                mac.update(release)
+                yield release
 
-    def encrypt_message(self, message, key_bytes):
-        """Шифрування XOR + Base64"""
+        if len(tail) < MAC_SIZE:
+            raise ValueError("Немає тегу автентифікації")
+        tag_holder.append(tail)
+
+    @instrument("lab05.encrypt_message", size_arg=1)
+    def encrypt_message(self, message, key_bytes, compression=None, authenticate=False):
+        """
+        Шифрування XOR + Base64. Без стиснення і тегу результат - Base64(XOR),
+        байт у байт як у початковій версії; інакше MESSAGE_PREFIX + Base64(прапорці + дані + тег)
+
+        compression: None (без стиснення) або "zlib"/"lzma"/"bz2" -
+        дані стискаються перед шифруванням, алгоритм записується у байт прапорців
+        authenticate: True - до шифротексту дописується тег HMAC-SHA256
+        (тег охоплює і байт прапорців)
+        """
         if isinstance(message, str):
             message_bytes = message.encode('utf-8')
         else:
             message_bytes = message
 
-        encrypted_bytes = bytearray()
+        if compression is not None:
+            message_bytes = b"".join(self._compressed_chunks([message_bytes], compression))
+
+        flags = self._flags(compression, authenticate)
+        if not flags:
+            return base64.b64encode(self.xor_bytes(message_bytes, key_bytes)).decode('utf-8')
+
+        encrypted_bytes = bytes([flags]) + self.xor_bytes(message_bytes, key_bytes)
+
+        if authenticate:
+            mac = self._mac(key_bytes)
+            mac.update(encrypted_bytes)
+            encrypted_bytes += mac.digest()
 
-        for i, byte in enumerate(message_bytes):
-            key_byte = key_bytes[i % len(key_bytes)]
-            encrypted_bytes.append(byte ^ key_byte)
+        return self.MESSAGE_PREFIX + base64.b64encode(encrypted_bytes).decode('utf-8')
 
-        return base64.b64encode(encrypted_bytes).decode('utf-8')
+    def decrypt_bytes(self, ciphertext, key_bytes, authenticate=False):
+        """
+        Розшифрування у байти (без декодування тексту).
+        Стиснення і наявність тегу визначаються байтом прапорців; якщо тег є,
+        він перевіряється до розшифрування і розпакування.
+
+        authenticate: True - вимагати тег HMAC (шифротекст без тегу відхиляється)
 
-    def decrypt_message(self, encrypted_base64, key_bytes):
-        """Розшифрування XOR"""
+        Returns:
+            bytes: відкриті дані або None (невірний ключ, тег чи пошкоджені дані)
+        """
         try:
-            encrypted_bytes = base64.b64decode(encrypted_base64)
-            decrypted_bytes = bytearray()
+            ciphertext = ciphertext.strip()
+            if not ciphertext.startswith(self.MESSAGE_PREFIX):
+                # Формат без заголовка: лише XOR, без стиснення і тегу
+                if authenticate:
+                    return None
+                return self.xor_bytes(base64.b64decode(ciphertext, validate=True), key_bytes)
 
-            for i, byte in enumerate(encrypted_bytes):
-                key_byte = key_bytes[i % len(key_bytes)]
-                decrypted_bytes.append(byte ^ key_byte)
+            payload = base64.b64decode(ciphertext[len(self.MESSAGE_PREFIX):], validate=True)
+            if not payload:
+                return None
+            compression_id, authenticated = self._parse_flags(payload[0])
+            if authenticate and not authenticated:
+                return None
+            if authenticated:
+                if len(payload) < 1 + MAC_SIZE:
+                    return None
+                payload, tag = payload[:-MAC_SIZE], payload[-MAC_SIZE:]
+                mac = self._mac(key_bytes)
+                mac.update(payload)
+                if not hmac.compare_digest(mac.digest(), tag):
+                    return None
 
-            return decrypted_bytes.decode('utf-8')
+            decrypted_bytes = self.xor_bytes(payload[1:], key_bytes)
+            return b"".join(self._decompressed_chunks([decrypted_bytes], compression_id))
         except Exception:
             return None
 
+    @instrument("lab05.decrypt_message", size_arg=1)
+    def decrypt_message(self, encrypted_base64, key_bytes, authenticate=False):
+        """
+        Розшифрування XOR у текст (стиснені дані розпаковуються автоматично)
+
+        authenticate: True - вимагати тег HMAC; за його відсутності чи невідповідності
+        повертається None і відкритий текст не розшифровується
+        """
+        decrypted_bytes = self.decrypt_bytes(encrypted_base64, key_bytes, authenticate)
+        if decrypted_bytes is None:
+            return None
+        try:
+            return decrypted_bytes.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+    def _aligned_chunk_size(self, key_bytes):
+        """
+        Розмір частини, кратний і 3 (Base64 без вирівнювання '='),
+        і довжині ключа (XOR кожної частини починається з початку ключа)
+        """
+        step = 3 * len(key_bytes) // math.gcd(3, len(key_bytes))
+        return max(step, self.stream_chunk_size // step * step)
+
+    def _xor_chunks(self, chunks, key_bytes):
+        """XOR потоку частин довільного розміру з неперервним зсувом ключа"""
+        offset = 0
+        for chunk in chunks:
+            yield self.xor_bytes(chunk, key_bytes, offset)
+            offset += len(chunk)
+
+    def _base64_chunks(self, chunks):
+        """Base64 потоку: байти накопичуються до кратності 3, тож кодування неперервне"""
+        carry = b""
+        for chunk in chunks:
+            if carry:
+                chunk = carry + chunk
+            ready = len(chunk) // 3 * 3
+            carry = chunk[ready:]
+            if ready:
+                yield base64.b64encode(chunk[:ready])
+        if carry:
+            yield base64.b64encode(carry)
+
+    @instrument("lab05.encrypt_file")
+    def encrypt_file(self, input_path, output_path, key_bytes, compression=None, authenticate=False):
+        """
+        Потокове шифрування файлу (XOR + Base64) з постійним використанням пам'яті.
+        Результат збігається з encrypt_message для всього вмісту файлу
+        (з тими самими параметрами compression та authenticate).
+        Стиснення, XOR, HMAC і Base64 виконуються за один прохід по даних.
+        """
+        chunk_size = self._aligned_chunk_size(key_bytes)
+
+        flags = self._flags(compression, authenticate)
+
+        with open(input_path, 'rb') as source, open(output_path, 'wb') as target:
+            plain = iter(lambda: source.read(chunk_size), b'')
+            encrypted = self._xor_chunks(self._compressed_chunks(plain, compression), key_bytes)
+            if flags:
+                target.write(self.MESSAGE_PREFIX.encode('ascii'))
+                encrypted = itertools.chain([bytes([flags])], encrypted)
+            if authenticate:
+                encrypted = self._tagged_chunks(encrypted, self._mac(key_bytes))
+            for encoded in self._base64_chunks(encrypted):
+                target.write(encoded)
+
+    def _decoded_base64_chunks(self, source, text_chunk_size):
+        """Декодування Base64 з файлу блоками по 4 символи (пробіли ігноруються)"""
+        pending = b""
+        for chunk in iter(lambda: source.read(text_chunk_size), b''):
+            pending += b"".join(chunk.split())
+            ready = len(pending) // 4 * 4
+            if ready:
+                yield base64.b64decode(pending[:ready], validate=True)
+                pending = pending[ready:]
+
+        if pending:
+            raise ValueError("Неповний блок Base64")
+
+    def _verified_output(self, output_path, authenticate, write_all):
+        """
+        Запис розшифрованих даних. З автентифікацією дані пишуться у тимчасовий
+        файл і з'являються під output_path лише після перевірки тегу
+        (без повторного читання вхідних даних).
+
+        write_all(target) записує дані; для автентифікації повертає
+        True/False - результат перевірки тегу.
+        """
+        temp_path = output_path + ".part" if authenticate else output_path
+        try:
+            with open(temp_path, 'wb') as target:
+                verified = write_all(target)
+            if authenticate:
+                if not verified:
+                    os.remove(temp_path)
+                    return False
+                os.replace(temp_path, output_path)
+            return True
+        except DECOMPRESSION_ERRORS:
+            os.remove(temp_path)
+            return False
+
+    def _decrypt_stream(self, output_path, open_chunks, key_bytes, compression_id, authenticated,
+                        mac_prefix=b"", mac_suffix=b""):
+        """
+        Розшифрування потоку у output_path із перевіркою тегу.
+        Тег обчислюється над mac_prefix + шифротекст + mac_suffix (заголовок входить у тег).
+        Для стиснених даних тег перевіряється окремим проходом ДО розпакування,
+        тож декомпресор ніколи не отримує непідтверджених даних; без стиснення
+        перевірка йде в тому ж проході, а результат з'являється лише після неї.
+
+        open_chunks() щоразу повертає новий ітератор шифротексту (з тегом у кінці, якщо він є).
+        """
+        def verified_chunks(chunks, result):
+            """Шифротекст без тегу; після вичерпання у result - результат перевірки тегу"""
+            mac, tag_holder = self._mac(key_bytes), []
+            mac.update(mac_prefix)
+            yield from self._untagged_chunks(chunks, mac, tag_holder)
+            mac.update(mac_suffix)
+            result.append(hmac.compare_digest(mac.digest(), tag_holder[0]))
+
+        if authenticated and compression_id:
+            result = []
+            try:
+                for _ in verified_chunks(open_chunks(), result):
+                    pass
+            except DECOMPRESSION_ERRORS:
+                return False
+            if not result[0]:
+                return False
+
+        def write_all(target):
+            chunks, result = open_chunks(), []
+            if authenticated:
+                chunks = verified_chunks(chunks, result)
+            for chunk in self._decompressed_chunks(self._xor_chunks(chunks, key_bytes), compression_id):
+                target.write(chunk)
+            return authenticated and result[0]
+
+        return self._verified_output(output_path, authenticated, write_all)
+
+    @instrument("lab05.decrypt_file")
+    def decrypt_file(self, input_path, output_path, key_bytes, authenticate=False):
+        """
+        Потокове розшифрування файлу, створеного encrypt_file або encrypt_message.
+        Пробільні символи (переноси рядків) у Base64 ігноруються;
+        стиснення і наявність тегу визначаються байтом прапорців;
+        тег (якщо є) перевіряється до розпакування.
+
+        authenticate: True - вимагати тег HMAC (файл без тегу відхиляється)
+
+        Returns:
+            bool: True - успішно, False - пошкоджені дані або невірний тег (вихідний файл видаляється)
+        """
+        text_chunk_size = self._aligned_chunk_size(key_bytes) // 3 * 4
+        prefix = self.MESSAGE_PREFIX.encode('ascii')
+
+        with open(input_path, 'rb') as source:
+            has_header = source.read(len(prefix)) == prefix
+            data_start = source.tell() if has_header else 0
+
+            def open_chunks():
+                """Зашифровані дані від початку (без байта прапорців)"""
+                source.seek(data_start)
+                chunks = self._decoded_base64_chunks(source, text_chunk_size)
+                if has_header:
+                    chunks = itertools.chain([next(chunks, b"")[1:]], chunks)
+                return chunks
+
+            # Без префікса - формат без заголовка: лише XOR, без стиснення і тегу
+            header, compression_id, authenticated = b"", 0, False
+            if has_header:
+                try:
+                    header = next(self._decoded_base64_chunks(source, text_chunk_size), b"")[:1]
+                    if not header:
+                        return False
+                    compression_id, authenticated = self._parse_flags(header[0])
+                except ValueError:
+                    return False
+
+            if authenticate and not authenticated:
+                return False
+
+            return self._decrypt_stream(output_path, open_chunks, key_bytes, compression_id,
+                                        authenticated, mac_prefix=header)
+
+    def encrypt_mail(self, raw_message, key_bytes):
+        """
+        Шифрування цілого листа (заголовки + тіло).
+        У відкритому вигляді лишаються лише From, To, Date та Message-ID.
+        Лист завжди отримує тег HMAC: при розшифруванні байтів без декодування
+        тексту лише тег відрізняє невірний ключ чи пошкоджений лист.
+        """
+        original = email.message_from_bytes(raw_message)
+        encrypted = self.encrypt_message(raw_message, key_bytes, authenticate=True)
+
+        result = email.message.Message()
+        for header in ("From", "To", "Date", "Message-ID"):
+            if original[header] is not None:
+                result[header] = original[header]
+        result["Subject"] = "Зашифроване повідомлення"
+        result["X-Lab5-Encrypted"] = "xor-base64"
+        result.set_payload("\n".join(encrypted[i:i + 76] for i in range(0, len(encrypted), 76)))
+        return result.as_bytes()
+
+    def decrypt_mail(self, raw_message, key_bytes):
+        """
+        Розшифрування листа, створеного encrypt_mail
+
+        Returns:
+            bytes: початковий лист або None
+        """
+        message = email.message_from_bytes(raw_message)
+        if message["X-Lab5-Encrypted"] is None:
+            return None
+
+        # Лист повертається як байти без декодування: тіла у latin-1, cp1251, KOI8
+        # чи двійкові частини не обов'язково є коректним UTF-8. Тег обов'язковий:
+        # лише він відрізняє невірний ключ, а лист без тегу (прапорець знято) відхиляється
+        return self.decrypt_bytes("".join(message.get_payload().split()), key_bytes, authenticate=True)
+
+    @staticmethod
+    def _describe_mail(raw_message):
+        """Опис листа для звіту: Message-ID або From і Date (тема зашифрованого листа - заглушка)"""
+        message = email.message_from_bytes(raw_message)
+        if message["Message-ID"]:
+            return str(message["Message-ID"])
+        return ", ".join(f"{header}: {message[header]}" for header in ("From", "Date")
+                         if message[header] is not None)
+
+    def _open_mailbox(self, path, mailbox_format, create):
+        """Відкриття скриньки mbox або Maildir"""
+        if mailbox_format == "maildir":
+            return mailbox.Maildir(path, factory=None, create=create)
+        return mailbox.mbox(path, create=create)
+
+    @instrument("lab05.process_mailbox")
+    def process_mailbox(self, source_path, target_path, key_bytes, mode="encrypt",
+                        mailbox_format="mbox", workers=None, chunk_size=64):
+        """
+        Пакетне шифрування/розшифрування поштової скриньки пулом процесів.
+        Листи передаються процесам частинами по chunk_size; порядок у вихідній
+        скриньці зберігається. Листи, які не вдалося розшифрувати, пропускаються.
+
+        Args:
+            source_path: вхідна скринька
+            target_path: вихідна скринька (того ж формату)
+            key_bytes: ключ
+            mode: "encrypt" або "decrypt"
+            mailbox_format: "mbox" або "maildir"
+            workers: кількість процесів (None - за кількістю ядер)
+            chunk_size: кількість листів в одному завданні
+
+        Returns:
+            dict: {"processed", "failed" (список (номер, ключ у скриньці, опис листа)),
+                   "seconds", "messages_per_second"}
+        """
+        start_time = time.perf_counter()
+        source = self._open_mailbox(source_path, mailbox_format, create=False)
+        target = self._open_mailbox(target_path, mailbox_format, create=True)
+        keys = sorted(source.keys()) if mailbox_format == "maildir" else list(source.keys())
+
+        processed = 0
+        failed = []
+
+        def collect(chunk_index, raw_messages, future):
+            nonlocal processed
+            for position, result in enumerate(future.result()):
+                if result is None:
+                    number = chunk_index * chunk_size + position
+                    failed.append((number + 1, keys[number], self._describe_mail(raw_messages[position])))
+                else:
+                    target.add(result)
+                    processed += 1
+
+        # Обмежена кількість завдань "у польоті", щоб не тримати всю скриньку в пам'яті
+        window = (workers or os.cpu_count() or 1) * 2
+        target.lock()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight = collections.deque()
+                for chunk_index, start in enumerate(range(0, len(keys), chunk_size)):
+                    raw_messages = [source.get_bytes(key) for key in keys[start:start + chunk_size]]
+                    future = pool.submit(_process_mail_chunk, mode, key_bytes, raw_messages)
+                    in_flight.append((chunk_index, raw_messages, future))
+                    if len(in_flight) >= window:
+                        collect(*in_flight.popleft())
+                while in_flight:
+                    collect(*in_flight.popleft())
+            target.flush()
+        finally:
+            target.unlock()
+            target.close()
+            source.close()
+
+        seconds = time.perf_counter() - start_time
+        return {
+            "processed": processed,
+            "failed": failed,
+            "seconds": seconds,
+            "messages_per_second": (processed + len(failed)) / seconds if seconds else 0.0
+        }
+
+    def is_raw_container(self, path):
+        """Чи є файл двійковим контейнером (а не Base64-текстом)"""
+        with open(path, 'rb') as f:
+            return f.read(len(self.RAW_MAGIC)) == self.RAW_MAGIC
+
+    @instrument("lab05.encrypt_file_raw")
+    def encrypt_file_raw(self, input_path, output_path, key_bytes, compression=None, authenticate=False):
+        """
+        Потокове шифрування у двійковий контейнер без Base64 (без збільшення на 33%).
+        Формат: заголовок RAW_HEADER + зашифровані байти (+ тег HMAC).
+        Прапорці заголовка: ідентифікатор стиснення (0 - без стиснення)
+        та FLAG_AUTHENTICATED. Довжина в заголовку - без тегу.
+        Тег охоплює шифротекст і остаточний заголовок (дописується у HMAC після даних,
+        бо довжина відома лише в кінці), тож змінити прапорці чи довжину непомітно не можна.
+        """
+        chunk_size = self._aligned_chunk_size(key_bytes)
+        flags = self._flags(compression, authenticate)
+        size = 0
+
+        with open(input_path, 'rb') as source, open(output_path, 'wb') as target:
+            target.write(self.RAW_HEADER.pack(self.RAW_MAGIC, self.RAW_VERSION, flags, 0))
+            plain = iter(lambda: source.read(chunk_size), b'')
+            mac = self._mac(key_bytes)
+            for chunk in self._xor_chunks(self._compressed_chunks(plain, compression), key_bytes):
+                target.write(chunk)
+                if authenticate:
+                    mac.update(chunk)
+                size += len(chunk)
+
+            # Довжина даних відома лише після стиснення - заголовок перезаписується
+            header = self.RAW_HEADER.pack(self.RAW_MAGIC, self.RAW_VERSION, flags, size)
+            if authenticate:
+                mac.update(header)
+                target.write(mac.digest())
+            target.seek(0)
+            target.write(header)
+
+    @instrument("lab05.decrypt_file_raw")
+    def decrypt_file_raw(self, input_path, output_path, key_bytes, authenticate=False):
+        """
+        Потокове розшифрування двійкового контейнера.
+        Якщо прапорець FLAG_AUTHENTICATED встановлено, тег перевіряється завжди.
+
+        authenticate: True - вимагати тег HMAC (контейнер без прапорця відхиляється,
+        а не довіряється заголовку)
+
+        Returns:
+            bool: True - успішно, False - невірний або пошкоджений контейнер
+        """
+        chunk_size = self._aligned_chunk_size(key_bytes)
+
+        with open(input_path, 'rb') as source:
+            header = source.read(self.RAW_HEADER.size)
+            if len(header) < self.RAW_HEADER.size:
+                return False
+            magic, version, flags, size = self.RAW_HEADER.unpack(header)
+            if magic != self.RAW_MAGIC or version != self.RAW_VERSION:
+                return False
+            try:
+                compression_id, authenticated = self._parse_flags(flags)
+            except ValueError:
+                return False
+            if authenticate and not authenticated:
+                return False
+            tag_size = MAC_SIZE if authenticated else 0
+            if os.fstat(source.fileno()).st_size - self.RAW_HEADER.size != size + tag_size:
+                return False
+
+            def open_chunks():
+                source.seek(self.RAW_HEADER.size)
+                return iter(lambda: source.read(chunk_size), b'')
+
+            return self._decrypt_stream(output_path, open_chunks, key_bytes, compression_id,
+                                        authenticated, mac_suffix=header)
+
+    @instrument("lab05.xor_file_in_place")
+    def xor_file_in_place(self, path, key_bytes):
+        """
+        Шифрування/розшифрування файлу на місці через відображення в пам'ять.
+        XOR симетричний, тому та сама операція і шифрує, і розшифровує.
+        Файл не отримує заголовка - формат має бути відомий сховищу.
+        """
+        if os.path.getsize(path) == 0:
+            return
+
+        chunk_size = self._aligned_chunk_size(key_bytes)
+
+        with open(path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mapped:
+            size = len(mapped)
+            if np is not None:
+                # XOR прямо у відображеній пам'яті без копіювання
+                view = np.frombuffer(mapped, dtype=np.uint8)
+                key_array = np.frombuffer(key_bytes * (chunk_size // len(key_bytes)), dtype=np.uint8)
+                for start in range(0, size, chunk_size):
+                    part = view[start:start + chunk_size]
+                    np.bitwise_xor(part, key_array[:len(part)], out=part)
+                del view, part
+            else:
+                for start in range(0, size, chunk_size):
+                    end = min(start + chunk_size, size)
+                    mapped[start:end] = self.xor_bytes(mapped[start:end], key_bytes)
+            mapped.flush()
+
 # --- Інтерфейс ---
 
 def show_menu():
@@ -79,7 +872,10 @@ def show_menu():
     print("1. Згенерувати ключ (Логін)")
     print("2. Написати зашифрований лист")
     print("3. Прочитати вхідний лист")
-    print("4. Вихід")
+    print("4. Зашифрувати файл (вкладення)")
+    print("5. Розшифрувати файл (вкладення)")
+    print("6. Пакетна обробка поштової скриньки (mbox/Maildir)")
+    print("7. Вихід")
     print("=" * 70)
 
 def generate_key_menu(system):
@@ -102,7 +898,7 @@ def generate_key_menu(system):
     print(f"Користувач: {email}")
     # Виводимо повний ключ
     print(f"Ключ сесії (SHA256): {key_hex}")
-    print("Ключ збережено у 'symmetric_key.json'")
+    print(f"Ключ збережено у '{system.keys_file}' та у зв'язку '{system.keyring.keyring_file}'")
 
 def encrypt_menu(system):
     print("\n" + "-" * 70)
@@ -123,7 +919,21 @@ def encrypt_menu(system):
         print("Повідомлення порожнє!")
         return
 
-    encrypted_msg = system.encrypt_message(message, key_bytes)
+    known = system.keyring.emails()
+    if known:
+        print(f"\nВідомі отримувачі: {', '.join(known)}")
+    recipients = input("Отримувачі через кому (Enter - лише ваш ключ): ").strip()
+
+    if recipients:
+        try:
+            encrypted_msg = system.encrypt_for_recipients(
+                message, [address.strip() for address in recipients.split(",") if address.strip()]
+            )
+        except KeyError as e:
+            print(f"\nПомилка: {e.args[0]}")
+            return
+    else:
+        encrypted_msg = system.encrypt_message(message, key_bytes)
 
     print("\n--- РЕЗУЛЬТАТ ---")
     print(f"Зашифровані дані:\n{encrypted_msg}")
@@ -166,7 +976,10 @@ def decrypt_menu(system):
             return
 
     if ciphertext:
-        decrypted_msg = system.decrypt_message(ciphertext, key_bytes)
+        if system.is_envelope(ciphertext):
+            decrypted_msg = system.decrypt_for_recipient(ciphertext, email, key_bytes)
+        else:
+            decrypted_msg = system.decrypt_message(ciphertext, key_bytes)
 
         print("\n" + "=" * 70)
         if decrypted_msg:
@@ -176,6 +989,138 @@ def decrypt_menu(system):
             print("ПОМИЛКА: Не вдалося розшифрувати (невірний ключ або дані).")
         print("=" * 70)
 
+def encrypt_file_menu(system):
+    print("\n" + "-" * 70)
+    print("ШИФРУВАННЯ ФАЙЛУ")
+    print("-" * 70)
+
+    key_data = system.load_key()
+    if not key_data:
+        print("\nПомилка: Спочатку згенеруйте ключ (пункт 1)!")
+        return
+
+    key_bytes, email = key_data
+    print(f"Відправник: {email}")
+
+    input_path = input("\nШлях до файлу: ").strip()
+    if not os.path.exists(input_path):
+        print("Файл не знайдено.")
+        return
+
+    print("\nФормат:")
+    print("1. Base64 (текст, для пересилання)")
+    print("2. Двійковий контейнер (без збільшення розміру)")
+    print("3. На місці (без копії, без заголовка)")
+    file_format = input("Ваш вибір: ").strip()
+
+    if file_format == "3":
+        system.xor_file_in_place(input_path, key_bytes)
+        print(f"Файл зашифровано на місці: {input_path}")
+        return
+
+    compression = input("Стиснення (zlib/lzma/bz2, Enter - без стиснення): ").strip() or None
+    if compression is not None and compression not in COMPRESSION_IDS:
+        print("Невідомий алгоритм стиснення.")
+        return
+
+    authenticate = input("Додати тег автентифікації HMAC? (y/n): ").strip().lower() == 'y'
+
+    output_path = input_path + ".enc"
+    if file_format == "2":
+        system.encrypt_file_raw(input_path, output_path, key_bytes, compression, authenticate)
+    else:
+        system.encrypt_file(input_path, output_path, key_bytes, compression, authenticate)
+    print(f"Файл зашифровано: {output_path}")
+    print(f"Розмір: {os.path.getsize(input_path)} -> {os.path.getsize(output_path)} байт")
+
+def decrypt_file_menu(system):
+    print("\n" + "-" * 70)
+    print("РОЗШИФРУВАННЯ ФАЙЛУ")
+    print("-" * 70)
+
+    key_data = system.load_key()
+    if not key_data:
+        print("\nПомилка: Немає ключа (пункт 1)!")
+        return
+
+    key_bytes, email = key_data
+    print(f"Отримувач: {email}")
+
+    input_path = input("\nШлях до зашифрованого файлу: ").strip()
+    if not os.path.exists(input_path):
+        print("Файл не знайдено.")
+        return
+
+    in_place = input("Файл зашифровано на місці (без заголовка)? (y/n): ").strip()
+    if in_place.lower() == 'y':
+        system.xor_file_in_place(input_path, key_bytes)
+        print(f"Файл розшифровано на місці: {input_path}")
+        return
+
+    if input_path.endswith(".enc"):
+        output_path = input_path[:-4]
+    else:
+        output_path = input_path + ".dec"
+
+    if os.path.exists(output_path):
+        output_path += ".dec"
+
+    # Тег, якщо він є, перевіряється завжди; тут лише вимога його наявності
+    authenticate = input("Вимагати тег автентифікації HMAC? (y/n): ").strip().lower() == 'y'
+
+    # Формат визначається автоматично за заголовком
+    if system.is_raw_container(input_path):
+        decrypted = system.decrypt_file_raw(input_path, output_path, key_bytes, authenticate)
+    else:
+        decrypted = system.decrypt_file(input_path, output_path, key_bytes, authenticate)
+
+    if decrypted:
+        print(f"Файл розшифровано: {output_path}")
+    else:
+        print("ПОМИЛКА: Не вдалося розшифрувати (пошкоджені дані або невірний тег).")
+
+def mailbox_menu(system):
+    print("\n" + "-" * 70)
+    print("ПАКЕТНА ОБРОБКА ПОШТОВОЇ СКРИНЬКИ")
+    print("-" * 70)
+
+    key_data = system.load_key()
+    if not key_data:
+        print("\nПомилка: Спочатку згенеруйте ключ (пункт 1)!")
+        return
+
+    key_bytes, email_address = key_data
+    print(f"Користувач: {email_address}")
+
+    print("\nДія:")
+    print("1. Зашифрувати скриньку")
+    print("2. Розшифрувати скриньку")
+    mode = "decrypt" if input("Ваш вибір: ").strip() == "2" else "encrypt"
+
+    source_path = input("\nШлях до скриньки: ").strip()
+    if not os.path.exists(source_path):
+        print("Скриньку не знайдено.")
+        return
+
+    mailbox_format = "maildir" if os.path.isdir(source_path) else "mbox"
+    target_path = source_path.rstrip(os.sep) + (".enc" if mode == "encrypt" else ".dec")
+    if os.path.exists(target_path):
+        print(f"Помилка: '{target_path}' вже існує.")
+        return
+
+    stats = system.process_mailbox(source_path, target_path, key_bytes, mode, mailbox_format)
+
+    print("\n" + "=" * 70)
+    print(f"Формат: {mailbox_format}")
+    print(f"Оброблено листів: {stats['processed']}")
+    print(f"Швидкість: {stats['messages_per_second']:.1f} листів/с")
+    if stats["failed"]:
+        print(f"Не вдалося розшифрувати: {len(stats['failed'])}")
+        for number, key, description in stats["failed"]:
+            print(f"  - лист {number} (ключ {key}): {description}")
+    print(f"Результат: {target_path}")
+    print("=" * 70)
+
 def main():
     system = EmailSymmetricSystem()
     while True:
@@ -188,6 +1133,12 @@ def main():
         elif choice == "3":
             decrypt_menu(system)
         elif choice == "4":
+            encrypt_file_menu(system)
+        elif choice == "5":
+            decrypt_file_menu(system)
+        elif choice == "6":
+            mailbox_menu(system)
+        elif choice == "7":
             break
         else:
             print("Невірний вибір.")
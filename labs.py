@@ -0,0 +1,343 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+from functools import lru_cache
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Модулі лабораторних: назва -> шлях до файлу.
+# lab01/lab02 мають назву code.py (збігається зі стандартним модулем code),
+# тому вони завантажуються за шляхом, а не через звичайний import.
+LAB_MODULES = {
+    "lab01": os.path.join("lab01", "code.py"),
+    "lab02": os.path.join("lab02", "code.py"),
+    "lab04": os.path.join("lab04", "lab4.py"),
+    "lab05": os.path.join("lab05", "lab5.py"),
+}
+
+
+@lru_cache(maxsize=None)
+def load_lab(name):
+    """
+    Ліниве завантаження модуля лабораторної роботи (один раз за процес).
+    Важкі залежності (напр. numpy у lab05) імпортуються лише тоді,
+    коли потрібна відповідна команда.
+    """
+    path = os.path.join(ROOT, LAB_MODULES[name])
+    spec = importlib.util.spec_from_file_location(f"labs_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@lru_cache(maxsize=None)
+def get_system(name):
+    """Спільний екземпляр системи лабораторної (кеші ключів живуть між запитами у --serve)"""
+    if name == "lab01":
+        return load_lab("lab01").PasswordSecurityAnalyzer()
+    if name == "lab04":
+        return load_lab("lab04").DigitalSignatureSystem()
+    if name == "lab05":
+        return load_lab("lab05").EmailSymmetricSystem()
+    raise ValueError(f"Лабораторна {name} не має системного об'єкта")
+
+
+def _text(params):
+    """Текст із параметра "text", файлу "file" або stdin (лише в режимі командного рядка)"""
+    if params.get("text") is not None:
+        return params["text"]
+    if params.get("file"):
+        with open(params["file"], 'r', encoding='utf-8') as f:
+            return f.read()
+    if params.get("_stdin"):
+        return sys.stdin.read()
+    raise ValueError("Не задано вхідний текст (text або file)")
+
+
+def cmd_analyze(params):
+    """Аналіз пароля (lab01)"""
+    lab = load_lab("lab01")
+    personal_data = {}
+    if params.get("name"):
+        personal_data["name"] = params["name"]
+    if params.get("birth_date"):
+        personal_data["birth_date"] = lab.parse_date(params["birth_date"])
+
+    results = get_system("lab01").analyze_password(params["password"], personal_data)
+    results.pop("password", None)
+    return results
+
+
+def cmd_cipher(params, decrypt):
+    """Шифр Цезаря або Віженера (lab02)"""
+    lab = load_lab("lab02")
+    text = _text(params)
+    if params.get("cipher", "caesar") == "caesar":
+        func = lab.caesar_decrypt if decrypt else lab.caesar_encrypt
+        return {"text": func(text, int(params["key"]))}
+    if params["cipher"] == "vigenere":
+        func = lab.vigenere_decrypt if decrypt else lab.vigenere_encrypt
+        return {"text": func(text, str(params["key"]))}
+    raise ValueError(f"Невідомий шифр: {params['cipher']}")
+
+
+def cmd_keygen(params):
+    """Генерація ключів підписувача та збереження у сховище як активної ідентичності (lab04)"""
+    dss = get_system("lab04")
+    name, birthdate, secret_word = params.get("name"), str(params.get("birthdate") or ""), params.get("secret")
+    if not name or not birthdate or not secret_word:
+        raise ValueError("Потрібні name, birthdate і secret")
+    if len(birthdate) != 8 or not birthdate.isdigit():
+        raise ValueError("Дата народження повинна бути у форматі DDMMYYYY")
+
+    private_key, public_key, private_key_hash = dss.generate_keys(name, birthdate, secret_word)
+    dss.save_keys(name, private_key, public_key, private_key_hash)
+    return {"name": name, "public_key": public_key}
+
+
+def _signer_keys(params):
+    """Ключі підписувача з параметра "name" або активна ідентичність (lab04)"""
+    keys = get_system("lab04").load_keys(params.get("name"))
+    if not keys:
+        raise ValueError("Ключі підписувача не знайдено")
+    return keys
+
+
+def _document_hash(params, algorithm):
+    """Хеш документу: потокове читання файлу або хеш тексту"""
+    dss = get_system("lab04")
+    if params.get("file"):
+        return dss.calculate_file_hash(params["file"], algorithm=algorithm)
+    return dss.calculate_document_hash(_text(params), algorithm)
+
+
+def cmd_sign(params):
+    """Цифровий підпис файлу або тексту (lab04)"""
+    dss = get_system("lab04")
+    keys = _signer_keys(params)
+    algorithm = params.get("algorithm") or dss.hash_algorithm
+    doc_hash = _document_hash(params, algorithm)
+    return {
+        "name": keys['name'],
+        "hash": doc_hash,
+        "signature": dss._sign_hash(doc_hash, keys['private_key'], algorithm)
+    }
+
+
+def cmd_verify(params):
+    """Перевірка цифрового підпису (lab04)"""
+    dss = get_system("lab04")
+    keys = _signer_keys(params)
+    algorithm, signature_hex = dss.parse_signature(params["signature"])
+    doc_hash = _document_hash(params, algorithm)
+    return {"name": keys['name'], "valid": dss._check_hash(doc_hash, signature_hex, keys['private_key'])}
+
+
+def _email_key(params):
+    """Ключ із Email та дати народження або збережений ключ (lab05)"""
+    system = get_system("lab05")
+    if params.get("email") and params.get("birthdate"):
+        return system.generate_key(params["email"], params["birthdate"])[0], params["email"]
+
+    key_data = system.load_key()
+    if not key_data:
+        raise ValueError(f"Ключ не знайдено: вкажіть email і birthdate або створіть '{system.keys_file}'")
+    return key_data
+
+
+def cmd_email_encrypt(params):
+    """Шифрування повідомлення (lab05)"""
+    system = get_system("lab05")
+    key_bytes, email = _email_key(params)
+    message = _text(params)
+
+    compression, authenticate = params.get("compression"), bool(params.get("authenticate"))
+    recipients = params.get("recipients") or []
+    if isinstance(recipients, str):
+        recipients = [address.strip() for address in recipients.split(",") if address.strip()]
+    if recipients:
+        ciphertext = system.encrypt_for_recipients(message, recipients, compression, authenticate)
+    else:
+        ciphertext = system.encrypt_message(message, key_bytes, compression, authenticate)
+    return {"sender": email, "ciphertext": ciphertext}
+
+
+def cmd_email_decrypt(params):
+    """Розшифрування повідомлення або конверта для кількох отримувачів (lab05)"""
+    system = get_system("lab05")
+    key_bytes, email = _email_key(params)
+    ciphertext = _text(params).strip()
+
+    if system.is_envelope(ciphertext):
+        message = system.decrypt_for_recipient(ciphertext, email, key_bytes, bool(params.get("authenticate")))
+    else:
+        message = system.decrypt_message(ciphertext, key_bytes, bool(params.get("authenticate")))
+    if message is None:
+        raise ValueError("Не вдалося розшифрувати: неправильний ключ або пошкоджені дані")
+    return {"recipient": email, "text": message}
+
+
+COMMANDS = {
+    "analyze": cmd_analyze,
+    "encrypt": lambda params: cmd_cipher(params, decrypt=False),
+    "decrypt": lambda params: cmd_cipher(params, decrypt=True),
+    "keygen": cmd_keygen,
+    "sign": cmd_sign,
+    "verify": cmd_verify,
+    "email-encrypt": cmd_email_encrypt,
+    "email-decrypt": cmd_email_decrypt,
+}
+
+
+def handle_request(request):
+    """
+    Обробка одного запиту режиму --serve
+
+    Returns:
+        dict: відповідь ("ok": True/False, поле "id" повертається без змін)
+    """
+    try:
+        op = request.get("op")
+        if op not in COMMANDS:
+            raise ValueError(f"Невідома операція: {op}")
+        params = {key: value for key, value in request.items() if not key.startswith("_")}
+        response = {"ok": True, **COMMANDS[op](params)}
+    except Exception as e:
+        response = {"ok": False, "error": str(e)}
+    if "id" in request:
+        response["id"] = request["id"]
+    return response
+
+
+def serve(input_stream, output_stream):
+    """
+    Довготривалий режим: один JSON-запит на рядок, одна JSON-відповідь на рядок.
+    Модулі та ключі завантажуються один раз, тому запуск інтерпретатора
+    не повторюється для кожної операції.
+        {"op": "encrypt", "cipher": "caesar", "key": 3, "text": "abc", "id": 1}
+    """
+    for line in input_stream:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Запит має бути JSON-об'єктом")
+        except ValueError as e:
+            response = {"ok": False, "error": str(e)}
+        else:
+            response = handle_request(request)
+        output_stream.write(json.dumps(response, ensure_ascii=False) + "\n")
+        output_stream.flush()
+
+
+def build_parser():
+    """Аргументи командного рядка: одна підкоманда на операцію"""
+    parser = argparse.ArgumentParser(description="Єдиний інтерфейс командного рядка лабораторних робіт")
+    parser.add_argument("--serve", action="store_true",
+                        help="читати JSON-запити зі stdin (по одному на рядок) і відповідати у stdout")
+    parser.add_argument("--metrics-file", help="файл для знімків метрик (операції/с, затримка)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json",
+                        help="формат знімка метрик")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="період запису знімка у режимі --serve (секунди)")
+    subparsers = parser.add_subparsers(dest="op")
+
+    def add_input(subparser):
+        source = subparser.add_mutually_exclusive_group()
+        source.add_argument("--text", help="вхідний текст (за замовчуванням - stdin)")
+        source.add_argument("--file", help="вхідний файл")
+
+    analyze = subparsers.add_parser("analyze", help="аналіз безпеки пароля (lab01)")
+    analyze.add_argument("password", help="пароль")
+    analyze.add_argument("--name", help="ім'я власника")
+    analyze.add_argument("--birth-date", dest="birth_date", help="дата народження (дд.мм.рррр)")
+
+    for op, help_text in (("encrypt", "шифрування Цезаря/Віженера (lab02)"),
+                          ("decrypt", "розшифрування Цезаря/Віженера (lab02)")):
+        cipher = subparsers.add_parser(op, help=help_text)
+        cipher.add_argument("--cipher", choices=["caesar", "vigenere"], default="caesar", help="шифр")
+        cipher.add_argument("--key", required=True, help="зсув (Цезар) або ключове слово (Віженер)")
+        add_input(cipher)
+
+    keygen = subparsers.add_parser("keygen", help="генерація ключів підписувача (lab04)")
+    keygen.add_argument("--name", required=True, help="ім'я підписувача")
+    keygen.add_argument("--birthdate", required=True, help="дата народження (DDMMYYYY)")
+    keygen.add_argument("--secret", required=True, help="секретне слово")
+
+    for op, help_text in (("sign", "цифровий підпис (lab04)"), ("verify", "перевірка підпису (lab04)")):
+        signature = subparsers.add_parser(op, help=help_text)
+        signature.add_argument("--name", help="ім'я підписувача (за замовчуванням - активний)")
+        add_input(signature)
+        if op == "sign":
+            signature.add_argument("--algorithm", help="хеш-алгоритм")
+        else:
+            signature.add_argument("--signature", required=True, help="підпис (v1:<алгоритм>:<hex>)")
+
+    for op, help_text in (("email-encrypt", "шифрування повідомлення (lab05)"),
+                          ("email-decrypt", "розшифрування повідомлення (lab05)")):
+        email = subparsers.add_parser(op, help=help_text)
+        email.add_argument("--email", help="Email для генерації ключа (за замовчуванням - збережений ключ)")
+        email.add_argument("--birthdate", help="дата/рік народження для генерації ключа")
+        email.add_argument("--authenticate", action="store_true", help="тег HMAC-SHA256")
+        add_input(email)
+        if op == "email-encrypt":
+            email.add_argument("--compression", choices=["zlib", "lzma", "bz2"], help="стиснення")
+            email.add_argument("--recipients", help="отримувачі через кому (конверт)")
+
+    return parser
+
+
+def main(argv=None):
+    """Головна функція: одна операція або режим --serve"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    writer = None
+    if args.metrics_file:
+        from metrics import SnapshotWriter
+        writer = SnapshotWriter(args.metrics_file, args.metrics_format, args.metrics_interval)
+
+    try:
+        return run(parser, args, writer)
+    finally:
+        if writer is not None:
+            writer.stop()
+
+
+def run(parser, args, writer=None):
+    """Виконання однієї операції або режиму --serve (writer - фоновий запис метрик)"""
+    if args.serve:
+        if writer is not None:
+            writer.start()
+        serve(sys.stdin, sys.stdout)
+        return 0
+    if not args.op:
+        parser.print_help()
+        return 2
+
+    params = {key: value for key, value in vars(args).items()
+              if value is not None and not key.startswith("metrics_")}
+    params["_stdin"] = True
+    try:
+        result = COMMANDS[args.op](params)
+    except Exception as e:
+        print(f"Помилка: {e}", file=sys.stderr)
+        return 1
+
+    if args.op in ("encrypt", "decrypt", "email-decrypt"):
+        print(result["text"], end="" if result["text"].endswith("\n") else "\n")
+    elif args.op == "email-encrypt":
+        print(result["ciphertext"])
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=4))
+    if args.op == "verify" and not result["valid"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Counter:
+    """Лічильник (кількість подій або байтів)"""
+
+    __slots__ = ("name", "help", "unit", "value")
+
+    def __init__(self, name, help_text="", unit=""):
+        self.name = name
+        self.help = help_text
+        self.unit = unit
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Збільшення лічильника"""
+        self.value += amount
+
+
+class Timer:
+    """Таймер: кількість вимірювань, сумарний і максимальний час (секунди)"""
+
+    __slots__ = ("name", "help", "count", "total", "max")
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Облік одного вимірювання"""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class MetricsRegistry:
+    """
+    Реєстр метрик процесу.
+    Метрики створюються один раз (під час імпорту модуля, що їх використовує),
+    після чого гарячий шлях лише змінює атрибути готового об'єкта - без пошуку за назвою
+    і без блокувань. Під паралельними потоками окремі інкременти можуть зрідка губитися;
+    для спостереження за навантаженням це прийнятна ціна за майже нульові накладні витрати.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, factory):
+        """Метрика за назвою (створюється під блокуванням лише один раз)"""
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = factory()
+        return metric
+
+    def counter(self, name, help_text=""):
+        """Лічильник подій"""
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def bytes_counter(self, name, help_text="", unit="bytes"):
+        """Лічильник обсягу даних (unit: "bytes" - байти, "chars" - символи тексту)"""
+        return self._get_or_create(name, lambda: Counter(name, help_text, unit=unit))
+
+    def timer(self, name, help_text=""):
+        """Таймер затримки"""
+        return self._get_or_create(name, lambda: Timer(name, help_text))
+
+    def snapshot(self):
+        """
+        Знімок усіх метрик
+
+        Returns:
+            dict: {"timestamp", "uptime_seconds", "metrics": {назва: значення}}
+        """
+        now = time.time()
+        metrics = {}
+        for name, metric in list(self._metrics.items()):
+            if isinstance(metric, Timer):
+                count, total = metric.count, metric.total
+                metrics[name] = {
+                    "type": "timer",
+                    "count": count,
+                    "sum_seconds": total,
+                    "avg_ms": total / count * 1000 if count else 0.0,
+                    "max_ms": metric.max * 1000
+                }
+            else:
+                metrics[name] = {"type": metric.unit or "counter", "value": metric.value}
+        return {"timestamp": now, "uptime_seconds": now - self.started, "metrics": metrics}
+
+    def to_prometheus(self, snapshot=None):
+        """Знімок у текстовому форматі Prometheus"""
+        snapshot = snapshot or self.snapshot()
+        lines = []
+        for name, values in snapshot["metrics"].items():
+            metric_name = name.replace(".", "_").replace("-", "_")
+            help_text = self._metrics[name].help
+            if values["type"] == "timer":
+                metric_name += "_seconds"
+                if help_text:
+                    lines.append(f"# HELP {metric_name} {help_text}")
+                lines.append(f"# TYPE {metric_name} summary")
+                lines.append(f"{metric_name}_count {values['count']}")
+                lines.append(f"{metric_name}_sum {values['sum_seconds']:.9f}")
+                lines.append(f"# TYPE {metric_name}_max gauge")
+                lines.append(f"{metric_name}_max {values['max_ms'] / 1000:.9f}")
+            else:
+                if values["type"] != "counter":
+                    metric_name += f"_{values['type']}"
+                metric_name += "_total"
+                if help_text:
+                    lines.append(f"# HELP {metric_name} {help_text}")
+                lines.append(f"# TYPE {metric_name} counter")
+                lines.append(f"{metric_name} {values['value']}")
+        return "\n".join(lines) + "\n"
+
+
+# Спільний реєстр процесу
+REGISTRY = MetricsRegistry()
+
+# LABS_METRICS=0 вимикає вимірювання: instrument повертає функції без змін
+ENABLED = os.environ.get("LABS_METRICS", "1") != "0"
+
+
+def _size(value, unit):
+    """Обсяг аргументу: байти (рядок - у кодуванні UTF-8) або символи"""
+    if unit == "bytes" and isinstance(value, str) and not value.isascii():
+        return len(value.encode('utf-8'))
+    return len(value)
+
+
+def instrument(name, size_arg=None, unit="bytes", registry=None):
+    """
+    Декоратор гарячого шляху: кількість викликів, помилок, затримка та
+    (якщо задано size_arg - індекс позиційного аргументу) обсяг оброблених даних.
+    Метрики створюються під час декорування, тож виклик торкається лише готових об'єктів.
+
+    Args:
+        name: префікс назв метрик, напр. "lab02.caesar_encrypt"
+        size_arg: індекс аргументу, обсяг якого додається до лічильника "<name>.processed"
+        unit: "bytes" (рядки рахуються в байтах UTF-8; ASCII - без кодування) або "chars"
+        registry: реєстр (None - спільний REGISTRY)
+    """
+    if not ENABLED:
+        return lambda func: func
+
+    registry = registry or REGISTRY
+    calls = registry.counter(f"{name}.calls", f"Кількість викликів {name}")
+    errors = registry.counter(f"{name}.errors", f"Кількість помилок {name}")
+    latency = registry.timer(f"{name}.latency", f"Затримка {name}")
+    processed = registry.bytes_counter(f"{name}.processed", f"Оброблені дані {name}", unit) \
+        if size_arg is not None else None
+    perf_counter = time.perf_counter
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                errors.value += 1
+                raise
+            finally:
+                seconds = perf_counter() - start
+                calls.value += 1
+                latency.count += 1
+                latency.total += seconds
+                if seconds > latency.max:
+                    latency.max = seconds
+                if processed is not None and len(args) > size_arg:
+                    try:
+                        processed.value += _size(args[size_arg], unit)
+                    except TypeError:
+                        pass
+        return wrapper
+
+    return decorator
+
+
+def write_snapshot(path, fmt="json", registry=None, snapshot=None):
+    """Атомарний запис знімка у файл JSON або Prometheus ("prometheus")"""
+    registry = registry or REGISTRY
+    snapshot = snapshot or registry.snapshot()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if fmt == "prometheus":
+            f.write(registry.to_prometheus(snapshot))
+        else:
+            json.dump(snapshot, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+class SnapshotWriter:
+    """
+    Фоновий потік, що періодично записує знімок метрик у файл.
+    У JSON додається поле "per_second" - частота подій з попереднього знімка.
+    """
+
+    def __init__(self, path, fmt="json", interval=10.0, registry=None):
+        if fmt not in ("json", "prometheus"):
+            raise ValueError(f"Невідомий формат метрик: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self.registry = registry or REGISTRY
+        self._previous = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _with_rates(self, snapshot):
+        """Частота викликів/подій між двома знімками"""
+        previous = self._previous
+        if previous is not None:
+            elapsed = snapshot["timestamp"] - previous["timestamp"]
+            for name, values in snapshot["metrics"].items():
+                current = values.get("count", values.get("value", 0))
+                old_values = previous["metrics"].get(name, {})
+                old = old_values.get("count", old_values.get("value", 0))
+                values["per_second"] = (current - old) / elapsed if elapsed > 0 else 0.0
+        self._previous = snapshot
+        return snapshot
+
+    def write(self):
+        """Запис одного знімка"""
+        write_snapshot(self.path, self.fmt, self.registry, self._with_rates(self.registry.snapshot()))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        """Запуск фонового запису"""
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Зупинка потоку та запис останнього знімка"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()